@@ -0,0 +1,198 @@
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Optional
+from utils.logger import configure_logging, setup_logger
+from utils.extraction import (
+    _get_full_prices,
+    _get_product_brand,
+    _get_product_name,
+    _get_sale_price,
+    _get_salesman_name,
+    _get_stars_reviews,
+    extract_product,
+    make_soup,
+    parse_seller_modal,
+)
+from utils.fixtures import Fixture, iter_fixtures
+from utils.metrics import percentile
+from utils.normalize import coerce_value
+
+logger = setup_logger()
+
+# Извлекатель DOM и столбцы результата, которые он заполняет
+SOUP_EXTRACTORS: dict[str, tuple[Callable, tuple[str, ...]]] = {
+    "_get_product_name": (_get_product_name, ("Название товара",)),
+    "_get_stars_reviews": (_get_stars_reviews, ("Рейтинг", "Отзывы")),
+    "_get_sale_price": (_get_sale_price, ("Цена с картой озона",)),
+    "_get_full_prices": (_get_full_prices, ("Цена со скидкой", "Цена")),
+    "_get_salesman_name": (_get_salesman_name, ("Продавец",)),
+    "_get_product_brand": (_get_product_brand, ("Бренд",)),
+}
+# Артикул дозаполняется со страницы после разбора, поэтому не сравнивается
+PRODUCT_FIELDS = (
+    "Название товара",
+    "Бренд",
+    "Цена с картой озона",
+    "Цена со скидкой",
+    "Цена",
+    "Рейтинг",
+    "Отзывы",
+    "Продавец",
+    "Ссылка на продавца",
+)
+SELLER_FIELDS = ("Данные о продавце", "ИНН")
+
+
+class BenchmarkResult:
+    """Время, пиковая память и совпадения с эталоном для одного извлекателя."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.durations: list[float] = []
+        self.peak_memory = 0
+        self.matched = 0
+        self.compared = 0
+        self.mismatches: list[str] = []
+
+    def check(self, fixture: Fixture, columns: tuple[str, ...], values: tuple) -> None:
+        for column, value in zip(columns, values):
+            if column not in fixture.expected:
+                continue
+            self.compared += 1
+            # Извлекатели DOM возвращают текст, а эталон может быть записан уже числами
+            expected = coerce_value(column, fixture.expected[column])
+            value = coerce_value(column, value)
+            if value == expected or (value is not None and str(value) == str(expected)):
+                self.matched += 1
+            else:
+                self.mismatches.append(
+                    f"{fixture.name}: {column} = {value!r}, ожидалось {expected!r}"
+                )
+
+    def report(self) -> str:
+        total = sum(self.durations)
+        throughput = len(self.durations) / total if total > 0 else 0.0
+        accuracy = f"{self.matched / self.compared:.1%}" if self.compared else "—"
+        return (
+            f"{self.name:<22} {throughput:>10.1f}/с "
+            f"p50 {percentile(self.durations, 50) * 1000:>7.2f} мс "
+            f"p95 {percentile(self.durations, 95) * 1000:>7.2f} мс "
+            f"память {self.peak_memory / 1024:>8.1f} КБ "
+            f"точность {accuracy} ({self.matched}/{self.compared})"
+        )
+
+
+def _as_tuple(value: Any) -> tuple:
+    return value if isinstance(value, tuple) else (value,)
+
+
+def _measure(
+    result: BenchmarkResult, func: Callable, args: tuple, repeat: int
+) -> Any:
+    """Замеряет время repeat вызовов и отдельно пиковую память одного вызова."""
+    value = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = func(*args)
+        result.durations.append(time.perf_counter() - started)
+    # tracemalloc замедляет выполнение, поэтому память меряется отдельным вызовом
+    tracemalloc.start()
+    try:
+        func(*args)
+        result.peak_memory = max(result.peak_memory, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+    return value
+
+
+def run_benchmark(
+    fixtures_dir: str,
+    repeat: int = 5,
+    limit: int = 0,
+    html_parser: str = "lxml",
+    only: Optional[list[str]] = None,
+) -> list[BenchmarkResult]:
+    """Прогоняет извлекатели по сохранённым фикстурам без браузера и сети."""
+    results: dict[str, BenchmarkResult] = {
+        name: BenchmarkResult(name)
+        for name in ("bs4_parse", *SOUP_EXTRACTORS, "extract_product", "parse_seller_modal")
+        if not only or name in only
+    }
+    count = 0
+    for fixture in iter_fixtures(fixtures_dir, limit=limit):
+        count += 1
+        # Разбор ограничен виджетами товара, как в основном парсере
+        soup = make_soup(fixture.html, html_parser)
+        if "bs4_parse" in results:
+            _measure(results["bs4_parse"], make_soup, (fixture.html, html_parser), repeat)
+        for name, (func, columns) in SOUP_EXTRACTORS.items():
+            if name in results:
+                value = _measure(results[name], func, (soup,), repeat)
+                results[name].check(fixture, columns, _as_tuple(value))
+        if "extract_product" in results:
+            fields = _measure(
+                results["extract_product"],
+                extract_product,
+                (fixture.raw_states, fixture.html),
+                repeat,
+            )
+            results["extract_product"].check(
+                fixture, PRODUCT_FIELDS, tuple(fields.get(column) for column in PRODUCT_FIELDS)
+            )
+        if fixture.seller_html and "parse_seller_modal" in results:
+            value = _measure(
+                results["parse_seller_modal"], parse_seller_modal, (fixture.seller_html,), repeat
+            )
+            results["parse_seller_modal"].check(fixture, SELLER_FIELDS, value)
+    logger.info(f"Фикстур обработано: {count}, повторов: {repeat}, парсер: {html_parser}")
+    return list(results.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Офлайн-бенчмарк извлекателей по сохранённым страницам Ozon"
+    )
+    parser.add_argument(
+        "--fixtures",
+        type=str,
+        required=True,
+        help="Каталог фикстур, записанных main.py --record-fixtures",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов на каждую фикстуру")
+    parser.add_argument("--limit", type=int, default=0, help="Ограничить число фикстур")
+    parser.add_argument(
+        "--html-parser",
+        type=str,
+        default="lxml",
+        help="Парсер BeautifulSoup (lxml или html.parser)",
+    )
+    parser.add_argument(
+        "--only",
+        type=str,
+        default=None,
+        help="Список извлекателей через запятую, например _get_full_prices,_get_sale_price",
+    )
+    parser.add_argument(
+        "--show-mismatches", action="store_true", help="Вывести расхождения с expected.json"
+    )
+    args = parser.parse_args()
+    configure_logging("benchmark.log")
+
+    results = run_benchmark(
+        args.fixtures,
+        repeat=max(1, args.repeat),
+        limit=args.limit,
+        html_parser=args.html_parser,
+        only=[name.strip() for name in args.only.split(",")] if args.only else None,
+    )
+    if not any(result.durations for result in results):
+        logger.error(f"В {args.fixtures} нет фикстур")
+        sys.exit(1)
+    for result in results:
+        if result.durations:
+            logger.info(result.report())
+        if args.show_mismatches:
+            for mismatch in result.mismatches:
+                logger.info(f"  {mismatch}")
@@ -8,6 +8,7 @@ from PyQt5.QtCore import Qt, pyqtSignal, QObject
 from PyQt5.QtGui import QIntValidator
 import qasync
 from main import main
+from utils.logger import configure_logging
 
 class ProgressHandler(QObject):
     progress_updated = pyqtSignal(int)
@@ -119,6 +120,20 @@ class ParserApp(QMainWindow):
         main_layout.addWidget(self.max_products_label)
         main_layout.addWidget(self.max_products_input)
 
+        # Количество параллельных страниц
+        self.concurrency_label = QLabel("Параллельных страниц:")
+        self.concurrency_input = QLineEdit("1")
+        self.concurrency_input.setValidator(QIntValidator(1, 32))
+        main_layout.addWidget(self.concurrency_label)
+        main_layout.addWidget(self.concurrency_input)
+
+        # Количество процессов
+        self.workers_label = QLabel("Процессов (у каждого свой браузер):")
+        self.workers_input = QLineEdit("1")
+        self.workers_input.setValidator(QIntValidator(1, 16))
+        main_layout.addWidget(self.workers_label)
+        main_layout.addWidget(self.workers_input)
+
         # Выходной файл
         self.output_file_label = QLabel("Выходной файл (.xlsx):")
         self.output_file_input = QLineEdit("ozon_products.xlsx")
@@ -145,6 +160,10 @@ class ParserApp(QMainWindow):
         self.resume_check = QCheckBox("Возобновить с последней ссылки")
         main_layout.addWidget(self.resume_check)
 
+        # Чекбокс запуска без окна браузера
+        self.headless_check = QCheckBox("Запускать браузер без окна")
+        main_layout.addWidget(self.headless_check)
+
         # Прогресс-бар
         self.progress_bar = QProgressBar()
         main_layout.addWidget(self.progress_bar)
@@ -172,7 +191,7 @@ class ParserApp(QMainWindow):
         if file_path:
             self.links_file_input.setText(file_path)
 
-    async def run_parsing(self, query, max_products, output_file, resume, links_file):
+    async def run_parsing(self, query, max_products, output_file, resume, links_file, concurrency, workers, headless):
         try:
             progress_handler = ProgressHandler(self.progress_bar)
             await main(
@@ -181,7 +200,10 @@ class ParserApp(QMainWindow):
                 output_file=output_file,
                 resume=resume,
                 links_file=links_file,
-                progress_handler=progress_handler
+                progress_handler=progress_handler,
+                concurrency=concurrency,
+                workers=workers,
+                headless=headless
             )
             self.status_output.append(f"Парсинг завершён. Файл сохранён: {output_file}")
         except Exception as e:
@@ -201,6 +223,16 @@ class ParserApp(QMainWindow):
         except ValueError:
             self.status_output.append("Ошибка: Введите корректное число для количества товаров")
             return
+        try:
+            concurrency = max(1, int(self.concurrency_input.text()))
+        except ValueError:
+            self.status_output.append("Ошибка: Введите корректное число параллельных страниц")
+            return
+        try:
+            workers = max(1, int(self.workers_input.text()))
+        except ValueError:
+            self.status_output.append("Ошибка: Введите корректное число процессов")
+            return
         output_file = self.output_file_input.text().strip()
         if not output_file:
             self.status_output.append("Ошибка: Введите имя выходного файла")
@@ -210,12 +242,14 @@ class ParserApp(QMainWindow):
             self.output_file_input.setText(output_file)
         links_file = self.links_file_input.text().strip() or None
         resume = self.resume_check.isChecked()
+        headless = self.headless_check.isChecked()
 
         self.parse_button.setEnabled(False)
         self.status_output.append("Парсинг начат...")
-        await self.run_parsing(query, max_products, output_file, resume, links_file)
+        await self.run_parsing(query, max_products, output_file, resume, links_file, concurrency, workers, headless)
 
 if __name__ == "__main__":
+    configure_logging()
     app = QApplication(sys.argv)
     loop = qasync.QEventLoop(app)
     asyncio.set_event_loop(loop)
@@ -1,94 +1,433 @@
 import asyncio
 import argparse
+import json
 import signal
+import socket
 import sys
+import threading
+import time
 import os
-from utils.logger import setup_logger
-from utils.prepare_work import preparation_before_work
-from utils.scroll import page_down, load_links_from_file
+from utils.logger import LOG_LEVELS, configure_logging, setup_logger
+from utils.prepare_work import go_to_search, preparation_before_work
+from utils.scroll import collect_links_via_api, page_down, load_links_from_file
 from utils.product_data import collect_data
+from utils.output_writer import build_excel_from_journal, journal_path_for
+from utils.storage import OUTPUT_FORMATS, open_store, output_path_for
+from utils.blocking import build_blocker
+from utils.checkpoint import CheckpointStore
+from utils.seller_cache import SellerCache
+from utils.sharding import run_sharded
+from utils.work_queue import open_work_queue
+from utils.urls import dedupe_product_urls
+from utils.fixtures import FixtureRecorder
+from utils.archive import PageArchive
+from utils.history import PriceHistory
+from utils.http_fetch import HttpFetcher
+from utils.memory import MemoryMonitor
+from utils.metrics import RunMetrics
+from utils.records import QUERY_COLUMN
 
 logger = setup_logger()
 
 
-def signal_handler(sig, frame):
-    logger.info("Получен сигнал прерывания, завершаем работу...")
-    sys.exit(0)
+def install_stop_handler(stop_event: asyncio.Event):
+    """Первый Ctrl+C останавливает выдачу новых товаров, второй прерывает работу сразу.
 
+    Возвращает прежний обработчик SIGINT, чтобы восстановить его по завершении.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return None
+    loop = asyncio.get_running_loop()
 
-async def main(
-    query: str, max_products: int, output_file: str, resume: bool, links_file: str = None, progress_handler=None
-) -> None:
-    """Асинхронная функция запуска программы с Playwright."""
-    logger.info(f"Запуск парсера с запросом: {query}, max_products: {max_products}, resume: {resume}, links_file: {links_file}")
-    browser = None
-    processed_file = f"processed_links_{query.replace(' ', '_')}.txt"
-    temp_file = f"temp_links_{query.replace(' ', '_')}.txt"
+    def handler(sig, frame):
+        if stop_event.is_set():
+            raise KeyboardInterrupt
+        logger.info(
+            "Получен сигнал прерывания: дообрабатываем начатые товары и сохраняем результаты "
+            "(повторный Ctrl+C прервёт работу сразу)"
+        )
+        loop.call_soon_threadsafe(stop_event.set)
+
+    return signal.signal(signal.SIGINT, handler)
+
+
+def export_work_queue(work_queue_url: str, output_format: str, output_file: str) -> None:
+    """Записывает строки всех подтверждённых задач общей очереди в одно хранилище."""
+    work_queue = open_work_queue(work_queue_url)
+    store = open_store(output_format=output_format, output_file=output_file)
     try:
-        logger.info("Инициализация браузера")
-        page, browser = await preparation_before_work(item_name=query)
-        logger.info("Браузер успешно открыт")
+        store.write_rows(work_queue.rows())
+    finally:
+        store.close()
+        work_queue.close()
+    logger.info(f"Результаты очереди задач сохранены: {output_path_for(output_format, output_file)}")
 
-        # Загружаем ссылки
-        if links_file and os.path.exists(links_file):
-            logger.info(f"Загрузка ссылок из файла: {links_file}")
-            products_urls_list = load_links_from_file(links_file)
-        elif resume and os.path.exists(temp_file):
-            logger.info(f"Возобновление парсинга, загрузка ссылок из {temp_file}")
-            products_urls_list = load_links_from_file(temp_file)
-        else:
+
+def query_file_names(query: str) -> tuple[str, str]:
+    """Возвращает имена файлов обработанных и собранных ссылок для запроса."""
+    suffix = query.replace(" ", "_")
+    return f"processed_links_{suffix}.txt", f"temp_links_{suffix}.txt"
+
+
+def load_queries(queries_file: str) -> list[str]:
+    """Загружает список запросов: JSONL с полем query или по одному запросу в строке."""
+    queries = []
+    with open(queries_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if queries_file.endswith(".jsonl"):
+                query = json.loads(line).get("query")
+                if query:
+                    queries.append(query.strip())
+            else:
+                queries.append(line)
+    # Порядок сохраняется, повторяющиеся запросы отбрасываются
+    return list(dict.fromkeys(queries))
+
+
+async def gather_product_urls(
+    page,
+    query: str,
+    max_products: int,
+    resume: bool,
+    links_file: str = None,
+    links_mode: str = "api",
+    checkpoint: CheckpointStore = None,
+) -> dict[str, str]:
+    """Собирает ссылки на товары запроса и исключает уже обработанные при возобновлении."""
+    processed_file, temp_file = query_file_names(query)
+
+    # Загружаем ссылки
+    if links_file and os.path.exists(links_file):
+        logger.info(f"Загрузка ссылок из файла: {links_file}")
+        products_urls_list = load_links_from_file(links_file)
+    elif resume and os.path.exists(temp_file):
+        logger.info(f"Возобновление парсинга, загрузка ссылок из {temp_file}")
+        products_urls_list = load_links_from_file(temp_file)
+    else:
+        products_urls_list = None
+        if links_mode == "api":
+            logger.info("Сбор ссылок через JSON-эндпоинт поиска")
+            products_urls_list = await collect_links_via_api(
+                page=page, colvo=max_products, temp_file=temp_file
+            )
+            if products_urls_list is None:
+                logger.warning("JSON-эндпоинт поиска недоступен, переход к прокрутке страницы")
+        if products_urls_list is None:
             products_urls_list = await page_down(
                 page=page,
                 css_selector="a[href*='/product/']",
                 colvo=max_products,
                 temp_file=temp_file,
             )
-        logger.info(f"Найдено товаров: {len(products_urls_list)}")
-        products_urls = {
-            str(i): f"https://ozon.ru{url}" if url.startswith("/product/") else url
-            for i, url in enumerate(products_urls_list)
-        }
-
-        # Если включено возобновление, исключаем уже обработанные ссылки
-        if resume and os.path.exists(processed_file):
+    logger.info(f"Найдено ссылок: {len(products_urls_list)}")
+    products_urls = dedupe_product_urls(products_urls_list)
+    logger.info(f"Уникальных товаров: {len(products_urls)}")
+
+    # Если включено возобновление, исключаем уже обработанные товары по id
+    if resume:
+        if os.path.exists(processed_file):
+            # Файл обработанных ссылок прежних версий переносится в контрольные точки
             try:
-                with open(processed_file, "r", encoding="utf-8") as f:
-                    processed_urls = {line.strip() for line in f if line.strip()}
-                logger.info(f"Загружено {len(processed_urls)} обработанных ссылок из {processed_file}")
-                products_urls = {
-                    k: v for k, v in products_urls.items() if v not in processed_urls
-                }
-                logger.info(f"Осталось обработать {len(products_urls)} ссылок")
+                checkpoint.migrate_processed_file(query, processed_file)
             except Exception as e:
                 logger.warning(f"Ошибка при чтении {processed_file}: {e}")
+        finished_ids = checkpoint.finished_ids(query)
+        logger.info(f"Уже обработано товаров по запросу: {len(finished_ids)}")
+        products_urls = {k: v for k, v in products_urls.items() if k not in finished_ids}
+        logger.info(f"Осталось обработать {len(products_urls)} ссылок")
+    return products_urls
 
-        if not products_urls:
-            logger.info("Нет ссылок для обработки")
-            return
-
-        logger.info("Сбор данных о товарах")
-        await collect_data(
-            products_urls=products_urls,
-            page=page,
-            progress_handler=progress_handler,
-            output_file=output_file,
-            processed_file=processed_file,
+
+async def main(
+    query: str,
+    max_products: int,
+    output_file: str,
+    resume: bool,
+    links_file: str = None,
+    progress_handler=None,
+    concurrency: int = 1,
+    rate_limit: float = 0.0,
+    output_format: str = "xlsx",
+    block_resources: bool = True,
+    block_types: str = None,
+    block_domains: str = None,
+    allow_domains: str = None,
+    parse_workers: int = None,
+    seller_cache_file: str = "sellers_cache.json",
+    seller_cache_ttl: float = 72.0,
+    links_mode: str = "api",
+    headless: bool = False,
+    browser_profile: str = None,
+    queries: list[str] = None,
+    metrics_file: str = "metrics.jsonl",
+    metrics_prom: str = None,
+    record_fixtures: str = None,
+    memory_high_water: float = 512.0,
+    checkpoint_file: str = "checkpoint.sqlite",
+    max_retries: int = 1,
+    retry_rounds: int = 2,
+    retry_concurrency: int = 1,
+    retry_backoff: float = 30.0,
+    incremental: bool = False,
+    history_file: str = "history.sqlite",
+    stale_hours: float = 24.0,
+    fetch_mode: str = "browser",
+    http_concurrency: int = 16,
+    workers: int = 1,
+    work_queue_url: str = None,
+    lease_timeout: float = 300.0,
+    archive_dir: str = None,
+    stop_event: asyncio.Event = None,
+) -> None:
+    """Асинхронная функция запуска программы с Playwright.
+
+    Если передан список queries, все запросы обрабатываются одним браузером
+    в одно хранилище со столбцом «Запрос», а товар, уже собранный по одному
+    из запросов, по следующим не собирается повторно.
+
+    В инкрементальном режиме собираются только новые товары и товары, собранные
+    раньше stale_hours часов назад; результаты и изменения цен пишутся в history_file.
+
+    В режиме fetch_mode="http" браузер проходит антибот-проверку один раз, а товары
+    запрашиваются через JSON-эндпоинт пулом из http_concurrency соединений.
+
+    С workers > 1 ссылки каждого запроса делятся между процессами, у каждого свой
+    браузер; строки, состояние товаров и прогресс собираются в этом процессе.
+
+    С work_queue_url товары берутся из общей очереди задач, которую могут разбирать
+    несколько машин: первый узел собирает ссылки и ставит их в очередь, остальные
+    сразу начинают обработку. Когда необработанных задач запроса не осталось,
+    ссылки собираются заново, а уже завершённые задачи снова ставятся в очередь
+    (с resume — только новые товары). Состояние товаров в этом режиме хранит очередь.
+
+    С archive_dir исходные данные страниц товаров сохраняются в сжатый архив,
+    по которому reextract.py повторяет извлечение без обращения к сайту.
+
+    Без stop_event устанавливается обработчик Ctrl+C, который плавно останавливает сбор;
+    вызывающий код может передать своё событие остановки.
+    """
+    queries = queries or ([query] if query else [])
+    if not queries:
+        raise ValueError("Не задан ни один поисковый запрос")
+    batch = len(queries) > 1
+    logger.info(f"Запуск парсера с запросами: {queries}, max_products: {max_products}, resume: {resume}, links_file: {links_file}, concurrency: {concurrency}")
+    browser = None
+    store = None
+    seller_cache = None
+    fetcher = None
+    metrics = RunMetrics(path=metrics_file or None, prometheus_path=metrics_prom)
+    memory = MemoryMonitor(high_water_mb=memory_high_water)
+    previous_handler = None
+    if stop_event is None:
+        stop_event = asyncio.Event()
+        previous_handler = install_stop_handler(stop_event)
+    checkpoint = CheckpointStore(checkpoint_file)
+    history = PriceHistory(history_file) if incremental else None
+    work_queue = (
+        open_work_queue(work_queue_url, max_attempts=retry_rounds + 1) if work_queue_url else None
+    )
+    worker_name = f"{socket.gethostname()}:{os.getpid()}"
+    archive = PageArchive(archive_dir) if archive_dir else None
+    try:
+        logger.info("Инициализация браузера")
+        page, browser = await preparation_before_work(
+            item_name=queries[0], headless=headless, profile_dir=browser_profile
+        )
+        logger.info("Браузер успешно открыт")
+
+        blocker = build_blocker(
+            enabled=block_resources,
+            blocked_types=block_types,
+            blocked_domains=block_domains,
+            allowed_domains=allow_domains,
         )
-        logger.info(f"Excel-файл сохранён: {output_file}")
+        seller_cache = (
+            SellerCache(path=seller_cache_file, ttl_hours=seller_cache_ttl)
+            if seller_cache_file
+            else None
+        )
+        store = open_store(output_format=output_format, output_file=output_file)
+        unexported = checkpoint.unexported()
+        if unexported:
+            logger.info(f"Дозапись строк, не попавших в хранилище при прошлом запуске: {len(unexported)}")
+            store.write_rows(row for _, _, row in unexported)
+            if not store.buffered():
+                checkpoint.mark_exported((q, product_id) for q, product_id, _ in unexported)
+        recorder = FixtureRecorder(record_fixtures) if record_fixtures else None
+        if fetch_mode == "http" and not seller_cache:
+            logger.warning("Кэш продавцов отключён: в режиме http каждый товар откроется в браузере")
+        # При нескольких процессах HTTP-клиент создаёт каждый воркер со своей сессией
+        if fetch_mode == "http" and workers <= 1:
+            fetcher = HttpFetcher(page, concurrency=http_concurrency)
+            await fetcher.start()
+        seen_ids: set[str] = set()
+
+        for index, current_query in enumerate(queries):
+            if stop_event.is_set():
+                logger.info("Сбор остановлен по сигналу прерывания")
+                break
+            if index > 0:
+                await go_to_search(page, current_query)
+            if work_queue is not None and work_queue.active(current_query):
+                # Ссылки уже собрал и поставил в очередь другой узел, и их ещё обрабатывают
+                logger.info(
+                    f"Очередь задач запроса: {work_queue.counts(current_query)}, сбор ссылок пропущен"
+                )
+                products_urls = {}
+            else:
+                products_urls = await gather_product_urls(
+                    page,
+                    current_query,
+                    max_products=max_products,
+                    resume=resume,
+                    links_file=links_file if not batch else None,
+                    links_mode=links_mode,
+                    checkpoint=checkpoint,
+                )
+                if batch:
+                    products_urls = {
+                        k: v for k, v in products_urls.items() if k not in seen_ids
+                    }
+                    seen_ids.update(products_urls)
+                    logger.info(f"Запрос «{current_query}»: новых товаров {len(products_urls)}")
+                if history:
+                    products_urls = history.select_for_update(products_urls, stale_hours)
+                if work_queue is not None:
+                    # Как и в контрольных точках, без --resume уже обработанные товары
+                    # собираются заново; в инкрементальном режиме ссылки уже отобраны историей
+                    added = work_queue.put(
+                        current_query, products_urls, reset=not resume or history is not None
+                    )
+                    logger.info(f"Поставлено в очередь задач: {added}")
+
+            if work_queue is not None:
+                if not work_queue.active(current_query):
+                    logger.info("В очереди нет задач для обработки")
+                    continue
+            elif not products_urls:
+                logger.info("Нет ссылок для обработки")
+                continue
+            else:
+                checkpoint.add_pending(current_query, products_urls, reset=not resume)
+
+            # Блокировка ставится после сбора ссылок первого запроса и действует для всех страниц
+            if blocker and not blocker.installed:
+                await blocker.install(page.context)
+
+            logger.info("Сбор данных о товарах")
+            if workers > 1:
+                await run_sharded(
+                    query=current_query,
+                    products_urls=products_urls,
+                    workers=workers,
+                    options={
+                        "headless": headless,
+                        "browser_profile": browser_profile,
+                        "block_resources": block_resources,
+                        "block_types": block_types,
+                        "block_domains": block_domains,
+                        "allow_domains": allow_domains,
+                        "output_file": output_file,
+                        "concurrency": concurrency,
+                        "rate_limit": rate_limit,
+                        "parse_workers": parse_workers,
+                        "seller_cache_file": seller_cache_file,
+                        "seller_cache_ttl": seller_cache_ttl,
+                        "metrics_file": metrics_file,
+                        "record_fixtures": record_fixtures,
+                        "memory_high_water": memory_high_water,
+                        "max_retries": max_retries,
+                        "retry_rounds": retry_rounds,
+                        "retry_concurrency": retry_concurrency,
+                        "retry_backoff": retry_backoff,
+                        "incremental": incremental,
+                        "fetch_mode": fetch_mode,
+                        "http_concurrency": http_concurrency,
+                        "archive_dir": archive_dir,
+                        "archive_run": archive.run_id if archive else None,
+                        "extra_fields": {QUERY_COLUMN: current_query} if batch else None,
+                    },
+                    store=store,
+                    checkpoint=checkpoint,
+                    history=history,
+                    seller_cache=seller_cache,
+                    progress_handler=progress_handler,
+                    stop_event=stop_event,
+                )
+                continue
+            await collect_data(
+                products_urls=products_urls,
+                page=page,
+                progress_handler=progress_handler,
+                output_file=output_file,
+                concurrency=concurrency,
+                rate_limit=rate_limit,
+                output_format=output_format,
+                blocker=blocker,
+                parse_workers=parse_workers,
+                seller_cache=seller_cache,
+                store=store,
+                extra_fields={QUERY_COLUMN: current_query} if batch else None,
+                metrics=metrics,
+                recorder=recorder,
+                memory=memory,
+                checkpoint=checkpoint if work_queue is None else None,
+                query=current_query,
+                stop_event=stop_event,
+                max_retries=max_retries,
+                retry_rounds=retry_rounds,
+                retry_concurrency=retry_concurrency,
+                retry_backoff=retry_backoff,
+                history=history,
+                fetcher=fetcher,
+                work_queue=work_queue,
+                worker_name=worker_name,
+                lease_timeout=lease_timeout,
+                archive=archive,
+            )
+        logger.info(f"Результаты сохранены: {output_path_for(output_format, output_file)}")
 
     except Exception as e:
         logger.error(f"Критическая ошибка в main: {e}")
         raise
     finally:
+        if store:
+            flush_started = time.perf_counter()
+            store.close()
+            metrics.record_stage("output_close", time.perf_counter() - flush_started)
+            checkpoint.mark_all_exported()
+        checkpoint.close()
+        if history:
+            history.close()
+        if work_queue is not None:
+            work_queue.close()
+        if archive:
+            archive.close()
+        metrics.close()
+        memory.log_summary()
+        if seller_cache:
+            seller_cache.close()
+        if fetcher:
+            await fetcher.close()
         if browser:
             await browser.close()
             logger.info("Браузер закрыт")
+        if previous_handler is not None:
+            signal.signal(signal.SIGINT, previous_handler)
 
 
 if __name__ == "__main__":
-    signal.signal(signal.SIGINT, signal_handler)
     parser = argparse.ArgumentParser(description="Сборщик продуктов Ozon")
-    parser.add_argument("--query", type=str, required=True, help="Запрос поиска")
+    parser.add_argument("--query", type=str, default=None, help="Запрос поиска")
+    parser.add_argument(
+        "--queries-file",
+        type=str,
+        default=None,
+        help="Файл со списком запросов (JSONL с полем query или по запросу в строке) для пакетного запуска",
+    )
     parser.add_argument(
         "--max-products",
         type=int,
@@ -101,6 +440,12 @@ if __name__ == "__main__":
         default="ozon_products.xlsx",
         help="Имя выходного файла Excel",
     )
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="xlsx",
+        help="Формат хранилища результатов (sqlite и parquet обновляют строки по артикулу)",
+    )
     parser.add_argument(
         "--resume",
         action="store_true",
@@ -112,17 +457,281 @@ if __name__ == "__main__":
         default=None,
         help="Путь к файлу с заранее собранными ссылками",
     )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Запускать браузер без окна",
+    )
+    parser.add_argument(
+        "--browser-profile",
+        type=str,
+        default=None,
+        help="Каталог постоянного профиля браузера с куки; при живой сессии прогрев пропускается",
+    )
+    parser.add_argument(
+        "--links-mode",
+        choices=("api", "scroll"),
+        default="api",
+        help="Сбор ссылок через JSON-эндпоинт поиска (api) или прокруткой страницы (scroll)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Количество страниц, параллельно обрабатывающих товары",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Число процессов со своим браузером, между которыми делятся ссылки запроса",
+    )
+    parser.add_argument(
+        "--work-queue",
+        type=str,
+        default=None,
+        help="Общая очередь задач для нескольких машин: sqlite:///файл, redis://хост:6379/0",
+    )
+    parser.add_argument(
+        "--lease-timeout",
+        type=float,
+        default=300.0,
+        help="Через сколько секунд незавершённая задача очереди выдаётся другому воркеру",
+    )
+    parser.add_argument(
+        "--fetch-mode",
+        choices=("browser", "http"),
+        default="browser",
+        help="Загрузка товаров переходом браузера (browser) или HTTP-запросами к JSON страницы с куки браузера (http)",
+    )
+    parser.add_argument(
+        "--http-concurrency",
+        type=int,
+        default=16,
+        help="Число одновременных HTTP-соединений в режиме http",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0.0,
+        help="Максимум переходов на страницы товаров в секунду для всех воркеров (0 без ограничения)",
+    )
+    parser.add_argument(
+        "--no-block-resources",
+        action="store_true",
+        help="Не блокировать изображения, шрифты, медиа и аналитику при сборе товаров",
+    )
+    parser.add_argument(
+        "--block-types",
+        type=str,
+        default=None,
+        help="Типы ресурсов для блокировки через запятую (по умолчанию image,font,media)",
+    )
+    parser.add_argument(
+        "--block-domains",
+        type=str,
+        default=None,
+        help="Домены для блокировки через запятую (по умолчанию счётчики и аналитика)",
+    )
+    parser.add_argument(
+        "--allow-domains",
+        type=str,
+        default=None,
+        help="Домены, запросы к которым никогда не блокируются, через запятую",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=None,
+        help="Количество процессов для разбора HTML (0 — разбор в основном процессе, по умолчанию по числу страниц)",
+    )
+    parser.add_argument(
+        "--seller-cache",
+        type=str,
+        default="sellers_cache.json",
+        help="Файл кэша данных о продавцах (пустая строка отключает кэш)",
+    )
+    parser.add_argument(
+        "--seller-cache-ttl",
+        type=float,
+        default=72.0,
+        help="Срок жизни записи в кэше продавцов, часов",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        default="metrics.jsonl",
+        help="Файл JSON-строк с длительностью этапов по каждому товару (пустая строка отключает)",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        type=str,
+        default=None,
+        help="Файл метрик в текстовом формате Prometheus, записывается в конце работы",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=1,
+        help="Попыток на товар в основном проходе; неудачные товары уходят в очередь повторов",
+    )
+    parser.add_argument(
+        "--retry-rounds",
+        type=int,
+        default=2,
+        help="Число отложенных проходов по очереди неудачных товаров",
+    )
+    parser.add_argument(
+        "--retry-concurrency",
+        type=int,
+        default=1,
+        help="Число страниц в отложенных проходах",
+    )
+    parser.add_argument(
+        "--retry-backoff",
+        type=float,
+        default=30.0,
+        help="Пауза перед первым отложенным проходом, с (удваивается с каждым проходом)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Собирать только новые товары и товары старше --stale-hours, вести историю цен",
+    )
+    parser.add_argument(
+        "--history-file",
+        type=str,
+        default="history.sqlite",
+        help="Файл SQLite с историей результатов и изменений цен",
+    )
+    parser.add_argument(
+        "--stale-hours",
+        type=float,
+        default=24.0,
+        help="Через сколько часов товар в инкрементальном режиме собирается заново",
+    )
+    parser.add_argument(
+        "--checkpoint-file",
+        type=str,
+        default="checkpoint.sqlite",
+        help="Файл SQLite с состоянием обработки товаров для возобновления",
+    )
+    parser.add_argument(
+        "--memory-high-water",
+        type=float,
+        default=512.0,
+        help="Порог памяти процесса в МБ, при превышении которого запускается сборка мусора (0 отключает)",
+    )
+    parser.add_argument(
+        "--record-fixtures",
+        type=str,
+        default=None,
+        help="Каталог для сохранения HTML страниц товаров и окна продавца (для benchmark.py)",
+    )
+    parser.add_argument(
+        "--archive",
+        type=str,
+        default=None,
+        help="Каталог сжатого архива страниц товаров для повторного извлечения (reextract.py)",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=LOG_LEVELS,
+        default="INFO",
+        help="Уровень логирования (DEBUG выводит строки по каждому товару)",
+    )
+    parser.add_argument(
+        "--log-file",
+        type=str,
+        default="parser.log",
+        help="Файл лога; лог предыдущего запуска переносится в <файл>.1",
+    )
+    parser.add_argument(
+        "--log-max-mb",
+        type=float,
+        default=10.0,
+        help="Размер файла лога в МБ, после которого он ротируется",
+    )
+    parser.add_argument(
+        "--log-backups",
+        type=int,
+        default=5,
+        help="Сколько старых файлов лога хранить",
+    )
+    parser.add_argument(
+        "--export-only",
+        action="store_true",
+        help="Только собрать результаты без парсинга: Excel из журнала или, с --work-queue, все строки очереди задач",
+    )
     args = parser.parse_args()
+    configure_logging(
+        log_file=args.log_file,
+        level=args.log_level,
+        max_bytes=int(args.log_max_mb * 1024 * 1024),
+        backup_count=args.log_backups,
+    )
+    if not args.query and not args.queries_file and not args.export_only:
+        parser.error("укажите --query или --queries-file")
+
+    if args.workers > 1 and args.work_queue:
+        parser.error("--workers и --work-queue не совмещаются: запустите несколько парсеров с одной очередью")
+
+    queries = load_queries(args.queries_file) if args.queries_file else None
+    if args.queries_file and not queries and not args.export_only:
+        parser.error(f"в {args.queries_file} нет ни одного запроса")
+
+    if args.export_only and args.work_queue:
+        export_work_queue(args.work_queue, args.output_format, args.output_file)
+        sys.exit(0)
+    if args.export_only:
+        journal_file = journal_path_for(args.output_file)
+        if not os.path.exists(journal_file):
+            logger.error(f"Журнал {journal_file} не найден")
+            sys.exit(1)
+        build_excel_from_journal(journal_file, args.output_file)
+        sys.exit(0)
 
     try:
         asyncio.run(
             main(
                 query=args.query,
+                queries=queries,
                 max_products=args.max_products,
                 output_file=args.output_file,
                 resume=args.resume,
                 links_file=args.links_file,
                 progress_handler=None,
+                concurrency=args.concurrency,
+                rate_limit=args.rate_limit,
+                output_format=args.output_format,
+                block_resources=not args.no_block_resources,
+                block_types=args.block_types,
+                block_domains=args.block_domains,
+                allow_domains=args.allow_domains,
+                parse_workers=args.parse_workers,
+                seller_cache_file=args.seller_cache,
+                seller_cache_ttl=args.seller_cache_ttl,
+                links_mode=args.links_mode,
+                headless=args.headless,
+                browser_profile=args.browser_profile,
+                metrics_file=args.metrics_file,
+                metrics_prom=args.metrics_prom,
+                record_fixtures=args.record_fixtures,
+                memory_high_water=args.memory_high_water,
+                checkpoint_file=args.checkpoint_file,
+                max_retries=max(1, args.max_retries),
+                retry_rounds=args.retry_rounds,
+                retry_concurrency=max(1, args.retry_concurrency),
+                retry_backoff=args.retry_backoff,
+                incremental=args.incremental,
+                history_file=args.history_file,
+                stale_hours=args.stale_hours,
+                fetch_mode=args.fetch_mode,
+                http_concurrency=max(1, args.http_concurrency),
+                workers=max(1, args.workers),
+                work_queue_url=args.work_queue,
+                lease_timeout=args.lease_timeout,
+                archive_dir=args.archive,
             )
         )
     except KeyboardInterrupt:
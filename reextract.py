@@ -0,0 +1,131 @@
+import argparse
+import os
+import sys
+import time
+from functools import partial
+from typing import Optional
+from utils.logger import configure_logging, setup_logger
+from utils.archive import iter_entries, list_runs, reextract_entry
+from utils.extraction import create_parse_executor
+from utils.storage import OUTPUT_FORMATS, open_store, output_path_for
+
+logger = setup_logger()
+
+# Строки передаются в хранилище пачками, чтобы не держать весь результат в памяти
+WRITE_BATCH = 500
+
+
+def _reextract_safe(directory: str, entry: dict) -> tuple[Optional[dict], Optional[str]]:
+    """Ошибка одного товара не должна прерывать обработку всего архива."""
+    try:
+        return reextract_entry(directory, entry), None
+    except Exception as e:
+        return None, f"{entry.get('url')}: {e}"
+
+
+def run_reextract(
+    archive_dir: str,
+    run_id: Optional[str] = None,
+    output_format: str = "xlsx",
+    output_file: str = "ozon_products_reextract.xlsx",
+    processes: int = 0,
+) -> int:
+    """Заново извлекает строки всех товаров запуска из архива и пишет их в хранилище.
+
+    Разбор идёт в processes процессах (0 — в текущем); к сайту запросов нет.
+    Повторяются и неудачные при сборе попытки, записанные в архив с видом ошибки.
+    Возвращает число записанных строк.
+    """
+    entries = list(iter_entries(archive_dir, run_id))
+    if not entries:
+        return 0
+    started = time.perf_counter()
+    work = partial(_reextract_safe, archive_dir)
+    executor = create_parse_executor(processes)
+    store = open_store(output_format=output_format, output_file=output_file)
+    written = 0
+    failed = 0
+    recovered = 0
+    batch: list[dict] = []
+    try:
+        results = executor.map(work, entries, chunksize=32) if executor else map(work, entries)
+        for entry, (row, error) in zip(entries, results):
+            if error:
+                failed += 1
+                logger.warning(f"Ошибка повторного извлечения {error}")
+                continue
+            if entry.get("error"):
+                recovered += 1
+            batch.append(row)
+            if len(batch) >= WRITE_BATCH:
+                store.write_rows(batch)
+                written += len(batch)
+                batch = []
+        store.write_rows(batch)
+        written += len(batch)
+    finally:
+        store.close()
+        if executor:
+            executor.shutdown()
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Извлечено товаров: {written}, из них неудачных при сборе: {recovered}, "
+        f"с ошибкой: {failed}, за {elapsed:.1f} с "
+        f"({written / elapsed if elapsed > 0 else 0:.0f} товаров/с)"
+    )
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Повторное извлечение данных товаров из архива страниц без обращения к Ozon"
+    )
+    parser.add_argument(
+        "--archive",
+        type=str,
+        required=True,
+        help="Каталог архива, записанного main.py --archive",
+    )
+    parser.add_argument(
+        "--run",
+        type=str,
+        default=None,
+        help="Идентификатор запуска в архиве (по умолчанию последний)",
+    )
+    parser.add_argument("--list-runs", action="store_true", help="Вывести запуски архива")
+    parser.add_argument(
+        "--output-file",
+        type=str,
+        default="ozon_products_reextract.xlsx",
+        help="Имя выходного файла",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="xlsx",
+        help="Формат результата",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Число процессов разбора (0 — разбор в основном процессе)",
+    )
+    args = parser.parse_args()
+    configure_logging("reextract.log")
+
+    if args.list_runs:
+        for run in list_runs(args.archive):
+            logger.info(run)
+        sys.exit(0)
+    written = run_reextract(
+        args.archive,
+        run_id=args.run,
+        output_format=args.output_format,
+        output_file=args.output_file,
+        processes=args.processes,
+    )
+    if not written:
+        logger.error(f"В архиве {args.archive} нет товаров для извлечения")
+        sys.exit(1)
+    logger.info(f"Результаты сохранены: {output_path_for(args.output_format, args.output_file)}")
@@ -0,0 +1,216 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from typing import Any, Iterator, Optional
+from utils.logger import setup_logger
+from utils.errors import ParseError
+from utils.extraction import extract_product, parse_seller_modal
+from utils.records import ProductRecord
+from utils.urls import product_id_from_url
+from utils.widget_state import states_from_page_json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = setup_logger()
+
+OBJECTS_DIR = "objects"
+RUNS_DIR = "runs"
+
+
+def _compress(data: bytes) -> tuple[bytes, str]:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data), ".zst"
+    return gzip.compress(data, compresslevel=6), ".gz"
+
+
+def _decompress(data: bytes, extension: str) -> bytes:
+    if extension == ".zst":
+        if zstandard is None:
+            raise RuntimeError("Архив сжат zstd: установите пакет zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class PageArchive:
+    """Архив исходных данных страниц товаров для повторного извлечения без сети.
+
+    Состояния всех виджетов, HTML страницы и окна продавца сохраняются сжатыми
+    (zstd, если установлен zstandard, иначе gzip) в objects/ под своим sha256,
+    поэтому одинаковое содержимое хранится один раз для всех запусков. Для каждого
+    запуска в runs/<run_id>/<writer>.jsonl пишется по строке на товар со ссылками
+    на эти объекты; writer различает процессы, пишущие в один запуск.
+    Данные не отбираются по названиям виджетов, поэтому переименованный или
+    новый виджет можно будет извлечь из архива, когда под него исправят разбор.
+    Неудачные попытки записываются с видом ошибки в поле error.
+    """
+
+    def __init__(self, directory: str, run_id: Optional[str] = None, writer: str = "main"):
+        self.directory = directory
+        self.run_id = run_id or time.strftime("%Y%m%dT%H%M%S")
+        self.saved = 0
+        self.failed = 0
+        self.stored_bytes = 0
+        run_dir = os.path.join(directory, RUNS_DIR, self.run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        os.makedirs(os.path.join(directory, OBJECTS_DIR), exist_ok=True)
+        self._manifest = open(os.path.join(run_dir, f"{writer}.jsonl"), "a", encoding="utf-8")
+
+    def _put(self, text: Optional[str]) -> Optional[str]:
+        """Сохраняет текст как объект и возвращает его адрес (sha256 и расширение)."""
+        if not text:
+            return None
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        for extension in (".zst", ".gz"):
+            if os.path.exists(self._object_path(digest + extension)):
+                return digest + extension
+        compressed, extension = _compress(data)
+        path = self._object_path(digest + extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Объект с тем же адресом мог одновременно записать другой процесс: замена атомарна
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+        self.stored_bytes += len(compressed)
+        return digest + extension
+
+    def _object_path(self, address: str) -> str:
+        return os.path.join(self.directory, OBJECTS_DIR, address[:2], address)
+
+    def record(
+        self,
+        product_id: Optional[str],
+        url: str,
+        raw_states: dict[str, str],
+        html: Optional[str] = None,
+        seller_html: Optional[str] = None,
+        seller_href: Optional[str] = None,
+        seller_details: Optional[str] = None,
+        inn: Optional[str] = None,
+        extra: Optional[dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Сохраняет исходные данные товара; ошибки записи не прерывают сбор.
+
+        raw_states — состояния всех виджетов с ключами вида webPrice-3121879-default-1;
+        error — вид ошибки неудачной попытки (None для собранного товара).
+        """
+        try:
+            entry = {
+                "product_id": product_id,
+                "url": url,
+                "ts": time.time(),
+                "states": self._put(json.dumps(raw_states, ensure_ascii=False)),
+                "html": self._put(html),
+                "seller_html": self._put(seller_html),
+                "seller_href": seller_href,
+                "seller_details": seller_details,
+                "inn": inn,
+                "extra": extra,
+                "error": error,
+            }
+            self._manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._manifest.flush()
+            if error:
+                self.failed += 1
+            else:
+                self.saved += 1
+        except Exception as e:
+            logger.warning(f"Ошибка при записи товара {url} в архив: {e}")
+
+    def close(self) -> None:
+        if self._manifest.closed:
+            return
+        self._manifest.close()
+        logger.info(
+            f"Архив страниц {self.directory}, запуск {self.run_id}: товаров {self.saved}, "
+            f"неудачных попыток {self.failed}, новых объектов {self.stored_bytes / 1024:.0f} КБ"
+        )
+
+
+def load_object(directory: str, address: Optional[str]) -> Optional[str]:
+    """Читает объект архива по адресу из манифеста."""
+    if not address:
+        return None
+    path = os.path.join(directory, OBJECTS_DIR, address[:2], address)
+    with open(path, "rb") as f:
+        return _decompress(f.read(), os.path.splitext(address)[1]).decode("utf-8")
+
+
+def list_runs(directory: str) -> list[str]:
+    runs_dir = os.path.join(directory, RUNS_DIR)
+    if not os.path.isdir(runs_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(runs_dir) if os.path.isdir(os.path.join(runs_dir, name))
+    )
+
+
+def iter_entries(directory: str, run_id: Optional[str] = None) -> Iterator[dict]:
+    """Строки манифестов запуска (по умолчанию последнего).
+
+    Из нескольких строк одного товара берётся последняя, но неудачная попытка
+    не заменяет уже записанный успешный сбор.
+    """
+    runs = list_runs(directory)
+    run_id = run_id or (runs[-1] if runs else None)
+    if run_id is None:
+        return
+    run_dir = os.path.join(directory, RUNS_DIR, run_id)
+    if not os.path.isdir(run_dir):
+        logger.warning(f"В архиве {directory} нет запуска {run_id}")
+        return
+    entries: dict[str, dict] = {}
+    for name in sorted(os.listdir(run_dir)):
+        if not name.endswith(".jsonl"):
+            continue
+        with open(os.path.join(run_dir, name), "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Последняя строка могла оборваться при падении
+                    logger.warning(f"Пропущена повреждённая строка манифеста {name}")
+                    continue
+                key = entry.get("product_id") or entry["url"]
+                previous = entries.get(key)
+                if entry.get("error") and previous is not None and not previous.get("error"):
+                    continue
+                entries[key] = entry
+    yield from entries.values()
+
+
+def reextract_entry(directory: str, entry: dict) -> dict:
+    """Заново извлекает строку результата товара из архива текущими извлекателями.
+
+    Артикул и ссылка на продавца, найденные при сборе вне виджетов, и данные
+    продавца из кэша (окно продавца не открывалось) берутся из манифеста.
+    Как и при сборе, без названия и цены выбрасывается ParseError.
+    """
+    url = entry["url"]
+    all_states = json.loads(load_object(directory, entry.get("states")) or "{}")
+    raw_states = states_from_page_json({"widgetStates": all_states})
+    fields = extract_product(raw_states, load_object(directory, entry.get("html")))
+    if not fields["Название товара"] and not fields["Цена со скидкой"] and not fields["Цена"]:
+        raise ParseError("Не удалось извлечь ни название, ни цену товара")
+    if fields["Ссылка на продавца"] is None:
+        fields["Ссылка на продавца"] = entry.get("seller_href")
+    if fields["Артикул"] is None:
+        fields["Артикул"] = entry.get("product_id") or product_id_from_url(url)
+    seller_html = load_object(directory, entry.get("seller_html"))
+    if seller_html:
+        seller_details, inn = parse_seller_modal(seller_html)
+    else:
+        seller_details, inn = entry.get("seller_details"), entry.get("inn")
+    record = ProductRecord.from_fields(fields, url, seller_details, inn)
+    record.extra = entry.get("extra")
+    return record.as_row()
@@ -0,0 +1,132 @@
+from typing import Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+from playwright.async_api import BrowserContext, Page, Route
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_BLOCKED_TYPES = ("image", "font", "media")
+DEFAULT_BLOCKED_DOMAINS = (
+    "mc.yandex.ru",
+    "yandex.ru/ads",
+    "an.yandex.ru",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "top-fwz1.mail.ru",
+    "counter.yadro.ru",
+    "vk.com",
+    "tiktok.com",
+)
+# Средний размер ответа по типу ресурса: заблокированный запрос не скачивается,
+# поэтому сэкономленный трафик оценивается по этим значениям
+ESTIMATED_SIZES = {
+    "image": 45_000,
+    "font": 35_000,
+    "media": 400_000,
+    "script": 60_000,
+    "stylesheet": 20_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+DEFAULT_ESTIMATED_SIZE = 5_000
+
+
+def _domain_matches(url: str, domains: Iterable[str]) -> bool:
+    """Проверяет, относится ли URL к одному из доменов (с поддоменами и префиксом пути)."""
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    for domain in domains:
+        domain_host, _, path_prefix = domain.partition("/")
+        if host == domain_host or host.endswith(f".{domain_host}"):
+            if not path_prefix or parts.path.lstrip("/").startswith(path_prefix):
+                return True
+    return False
+
+
+class ResourceBlocker:
+    """Блокирует ненужные парсеру запросы через перехват Playwright."""
+
+    def __init__(
+        self,
+        blocked_types: Iterable[str] = DEFAULT_BLOCKED_TYPES,
+        blocked_domains: Iterable[str] = DEFAULT_BLOCKED_DOMAINS,
+        allowed_types: Iterable[str] = (),
+        allowed_domains: Iterable[str] = (),
+    ):
+        self.blocked_types = frozenset(blocked_types)
+        self.blocked_domains = tuple(blocked_domains)
+        self.allowed_types = frozenset(allowed_types)
+        self.allowed_domains = tuple(allowed_domains)
+        self.page_stats: dict[Page, list[int]] = {}
+        self.total_blocked = 0
+        self.total_bytes_saved = 0
+        self.installed = False
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        """Решает, блокировать ли запрос. Разрешающие списки приоритетнее запрещающих."""
+        if self.allowed_domains and _domain_matches(url, self.allowed_domains):
+            return False
+        if resource_type in self.allowed_types:
+            return False
+        if self.blocked_domains and _domain_matches(url, self.blocked_domains):
+            return True
+        return resource_type in self.blocked_types
+
+    async def _handle_route(self, route: Route) -> None:
+        request = route.request
+        if not self.should_block(request.url, request.resource_type):
+            await route.continue_()
+            return
+        saved = ESTIMATED_SIZES.get(request.resource_type, DEFAULT_ESTIMATED_SIZE)
+        self.total_blocked += 1
+        self.total_bytes_saved += saved
+        try:
+            stats = self.page_stats.setdefault(request.frame.page, [0, 0])
+            stats[0] += 1
+            stats[1] += saved
+        except Exception:
+            pass
+        await route.abort()
+
+    async def install(self, context: BrowserContext) -> None:
+        """Включает перехват запросов для всех страниц контекста."""
+        await context.route("**/*", self._handle_route)
+        self.installed = True
+        logger.info(
+            f"Блокировка ресурсов включена: типы {sorted(self.blocked_types)}, "
+            f"доменов в запрещённом списке: {len(self.blocked_domains)}"
+        )
+
+    def pop_page_stats(self, page: Page) -> Tuple[int, int]:
+        """Возвращает число заблокированных запросов и оценку сэкономленных байт для страницы."""
+        blocked, saved = self.page_stats.pop(page, (0, 0))
+        return blocked, saved
+
+    def log_summary(self) -> None:
+        logger.info(
+            f"Заблокировано запросов: {self.total_blocked}, "
+            f"сэкономлено ≈{self.total_bytes_saved / 1_048_576:.1f} МБ"
+        )
+
+
+def build_blocker(
+    enabled: bool = True,
+    blocked_types: Optional[str] = None,
+    blocked_domains: Optional[str] = None,
+    allowed_domains: Optional[str] = None,
+) -> Optional[ResourceBlocker]:
+    """Создаёт блокировщик по спискам через запятую из аргументов командной строки."""
+    if not enabled:
+        return None
+
+    def split(value: Optional[str], default: Iterable[str]) -> list[str]:
+        if value is None:
+            return list(default)
+        return [item.strip() for item in value.split(",") if item.strip()]
+
+    return ResourceBlocker(
+        blocked_types=split(blocked_types, DEFAULT_BLOCKED_TYPES),
+        blocked_domains=split(blocked_domains, DEFAULT_BLOCKED_DOMAINS),
+        allowed_domains=split(allowed_domains, ()),
+    )
@@ -0,0 +1,172 @@
+import json
+import sqlite3
+import time
+from typing import Iterable, Optional
+from utils.errors import PERMANENT_KINDS
+from utils.logger import setup_logger
+from utils.urls import load_processed_ids
+
+logger = setup_logger()
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    query TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    row TEXT,
+    error TEXT,
+    exported INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL,
+    PRIMARY KEY (query, product_id)
+)
+"""
+
+
+class CheckpointStore:
+    """Состояние обработки товаров в SQLite (WAL): переживает падение и прерывание.
+
+    Для каждого товара запроса хранятся состояние (pending/in_flight/done/failed),
+    число попыток и строка результата. Строка и состояние done пишутся одной
+    транзакцией; флаг exported отмечает строки, уже переданные в хранилище результатов,
+    поэтому строки, не дошедшие до него из-за падения, дописываются при следующем запуске.
+    """
+
+    def __init__(self, path: str = "checkpoint.sqlite"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(_SCHEMA)
+            columns = {info[1] for info in self.connection.execute("PRAGMA table_info(products)")}
+            if "error" not in columns:
+                self.connection.execute("ALTER TABLE products ADD COLUMN error TEXT")
+            # Товары, которые были в обработке при падении, снова ждут обработки
+            recovered = self.connection.execute(
+                "UPDATE products SET state = ? WHERE state = ?", (PENDING, IN_FLIGHT)
+            ).rowcount
+        if recovered:
+            logger.info(f"Возвращено в очередь незавершённых товаров: {recovered}")
+        logger.info(f"Открыт файл контрольных точек {path}")
+
+    def migrate_processed_file(self, query: str, processed_file: str) -> int:
+        """Переносит старый файл processed_links_*.txt: его товары считаются готовыми."""
+        processed_ids = load_processed_ids(processed_file)
+        if not processed_ids:
+            return 0
+        now = time.time()
+        with self.connection:
+            migrated = self.connection.executemany(
+                "INSERT OR IGNORE INTO products (query, product_id, url, state, exported, updated) "
+                "VALUES (?, ?, ?, ?, 1, ?)",
+                (
+                    (query, product_id, f"https://www.ozon.ru/product/{product_id}/", DONE, now)
+                    for product_id in processed_ids
+                ),
+            ).rowcount
+        if migrated:
+            logger.info(f"Из {processed_file} перенесено обработанных товаров: {migrated}")
+        return migrated
+
+    def finished_ids(self, query: str) -> set[str]:
+        """Товары запроса, которые не нужно обрабатывать снова: готовые и удалённые с сайта."""
+        return {
+            product_id
+            for (product_id,) in self.connection.execute(
+                "SELECT product_id FROM products WHERE query = ? "
+                "AND (state = ? OR (state = ? AND error IN (%s)))"
+                % ", ".join("?" for _ in PERMANENT_KINDS),
+                (query, DONE, FAILED, *PERMANENT_KINDS),
+            )
+        }
+
+    def add_pending(self, query: str, products: dict[str, str], reset: bool = False) -> None:
+        """Регистрирует товары запроса; с reset уже обработанные снова ставятся в очередь."""
+        now = time.time()
+        conflict = (
+            "DO UPDATE SET state = excluded.state, attempts = 0, url = excluded.url, "
+            "updated = excluded.updated"
+            if reset
+            else "DO NOTHING"
+        )
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO products (query, product_id, url, state, updated) "
+                f"VALUES (?, ?, ?, ?, ?) ON CONFLICT (query, product_id) {conflict}",
+                ((query, product_id, url, PENDING, now) for product_id, url in products.items()),
+            )
+
+    def mark_in_flight(self, query: str, product_id: str) -> None:
+        with self.connection:
+            self.connection.execute(
+                "UPDATE products SET state = ?, attempts = attempts + 1, updated = ? "
+                "WHERE query = ? AND product_id = ?",
+                (IN_FLIGHT, time.time(), query, product_id),
+            )
+
+    def mark_finished(self, query: str, product_id: str, row: dict) -> None:
+        """Сохраняет строку результата и состояние done одной транзакцией."""
+        with self.connection:
+            self.connection.execute(
+                "UPDATE products SET state = ?, row = ?, error = NULL, exported = 0, updated = ? "
+                "WHERE query = ? AND product_id = ?",
+                (
+                    DONE,
+                    json.dumps(row, ensure_ascii=False, default=str),
+                    time.time(),
+                    query,
+                    product_id,
+                ),
+            )
+
+    def mark_failed(self, query: str, product_id: str, error: str) -> None:
+        """Отмечает неудачную обработку с видом ошибки; строка результата не пишется."""
+        with self.connection:
+            self.connection.execute(
+                "UPDATE products SET state = ?, error = ?, updated = ? "
+                "WHERE query = ? AND product_id = ?",
+                (FAILED, error, time.time(), query, product_id),
+            )
+
+    def mark_exported(self, keys: Iterable[tuple[str, str]]) -> None:
+        """Отмечает строки (запрос, id товара), записанные в хранилище результатов."""
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE products SET exported = 1 WHERE query = ? AND product_id = ?", keys
+            )
+
+    def mark_all_exported(self) -> None:
+        """Отмечает все готовые строки после успешного закрытия хранилища результатов."""
+        with self.connection:
+            self.connection.execute(
+                "UPDATE products SET exported = 1 WHERE exported = 0 AND row IS NOT NULL"
+            )
+
+    def unexported(self) -> list[tuple[str, str, dict]]:
+        """Возвращает готовые строки, которые не успели попасть в хранилище результатов."""
+        return [
+            (query, product_id, json.loads(row))
+            for query, product_id, row in self.connection.execute(
+                "SELECT query, product_id, row FROM products "
+                "WHERE exported = 0 AND row IS NOT NULL"
+            )
+        ]
+
+    def counts(self, query: Optional[str] = None) -> dict[str, int]:
+        sql = "SELECT state, COUNT(*) FROM products"
+        params: tuple = ()
+        if query is not None:
+            sql += " WHERE query = ?"
+            params = (query,)
+        return dict(self.connection.execute(sql + " GROUP BY state", params).fetchall())
+
+    def close(self) -> None:
+        logger.info(f"Состояние товаров: {self.counts()}")
+        self.connection.close()
@@ -0,0 +1,58 @@
+import asyncio
+from typing import Optional
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+# Виды ошибок обработки товара
+TIMEOUT = "timeout"
+CAPTCHA = "captcha"
+NOT_FOUND = "not_found"
+PARSE = "parse"
+OTHER = "other"
+
+# Признаки адреса антибот-проверки вместо страницы товара
+ANTIBOT_URL_MARKERS = ("/abt/", "captcha", "challenge")
+
+# Ошибки, при которых повторная попытка ничего не изменит
+PERMANENT_KINDS = frozenset({NOT_FOUND})
+
+
+class ProductFetchError(Exception):
+    """Ошибка обработки страницы товара с видом для очереди повторов."""
+
+    kind = OTHER
+
+    def __init__(self, message: str, kind: Optional[str] = None):
+        super().__init__(message)
+        if kind is not None:
+            self.kind = kind
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind not in PERMANENT_KINDS
+
+
+class CaptchaError(ProductFetchError):
+    """Вместо страницы товара показана антибот-проверка."""
+
+    kind = CAPTCHA
+
+
+class ProductNotFoundError(ProductFetchError):
+    """Товар удалён (404) или снят с продажи."""
+
+    kind = NOT_FOUND
+
+
+class ParseError(ProductFetchError):
+    """Страница загрузилась, но поля товара извлечь не удалось."""
+
+    kind = PARSE
+
+
+def classify_error(error: BaseException) -> ProductFetchError:
+    """Приводит произвольное исключение к ProductFetchError нужного вида."""
+    if isinstance(error, ProductFetchError):
+        return error
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, PlaywrightTimeoutError)):
+        return ProductFetchError(str(error), TIMEOUT)
+    return ProductFetchError(f"{type(error).__name__}: {error}", OTHER)
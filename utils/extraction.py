@@ -0,0 +1,349 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from utils.logger import configure_worker_logging, relay_worker_logs
+from utils.normalize import normalize_fields
+
+# Модуль выполняется в процессах пула разбора: при импорте в дочернем процессе
+# нельзя перенастраивать обработчики и пересоздавать parser.log
+logger = logging.getLogger("OzonParser")
+
+# Поля, при отсутствии которых в состояниях виджетов нужен разбор DOM
+DOM_FALLBACK_FIELDS = ("Название товара", "Рейтинг", "Цена со скидкой", "Продавец", "Бренд")
+# Виджеты, внутри которых извлекатели _get_* ищут данные; остальной DOM не строится
+DOM_WIDGETS = (
+    "webProductHeading",
+    "webSingleProductScore",
+    "webPrice",
+    "webCurrentSeller",
+    "breadCrumbs",
+)
+_WIDGET_STRAINER = SoupStrainer(attrs={"data-widget": list(DOM_WIDGETS)})
+
+
+def make_soup(html: str, parser: str = "lxml") -> BeautifulSoup:
+    """Разбирает только поддеревья нужных виджетов страницы товара."""
+    return BeautifulSoup(html, parser, parse_only=_WIDGET_STRAINER)
+
+
+def _get_stars_reviews(
+    soup: BeautifulSoup,
+) -> Tuple[Optional[str], Optional[str]]:
+    """Извлекает рейтинг и количество отзывов продавца."""
+    try:
+        product_statistic = soup.select_one("div[data-widget='webSingleProductScore']")
+        if product_statistic and " • " in product_statistic.text:
+            stars, reviews = product_statistic.text.strip().split(" • ")
+            return stars.strip(), reviews.strip()
+        return None, None
+    except Exception:
+        return None, None
+    finally:
+        product_statistic = None
+
+
+def _get_sale_price(soup: BeautifulSoup) -> Optional[str]:
+    """Извлекает цену с Ozon Картой."""
+    try:
+        price_element = soup.find(
+            "span", string=lambda text: text and "Ozon Карт" in text
+        )
+        if price_element and price_element.parent:
+            price_span = price_element.parent.select_one("div > span")
+            if price_span:
+                return price_span.text.strip()
+        return None
+    except Exception:
+        return None
+    finally:
+        price_element = price_span = None
+
+
+def _get_full_prices(soup: BeautifulSoup) -> Tuple[Optional[str], Optional[str]]:
+    """Извлекает цену до скидок и без Ozon Карты."""
+    try:
+        # Основной вариант через "без Ozon Карты"
+        price_element = soup.find(
+            "span", string=lambda text: text and "без Ozon Карты" in text
+        )
+        if price_element and price_element.parent and price_element.parent.parent:
+            price_spans = price_element.parent.parent.select("div > span")
+            if price_spans:
+                discount_price = price_spans[0].text.strip()
+                base_price = price_spans[1].text.strip() if len(price_spans) > 1 else None
+                return discount_price, base_price
+
+        # Обходной вариант через data-widget="webPrice"
+        web_price_widget = soup.find("div", {"data-widget": "webPrice"})
+        if web_price_widget:
+            price_spans = web_price_widget.select("div.pm3_27 span")
+            if price_spans:
+                discount_price = price_spans[0].text.strip()
+                base_price = price_spans[1].text.strip() if len(price_spans) > 1 else None
+                return discount_price, base_price
+
+        return None, None
+    except Exception:
+        return None, None
+    finally:
+        price_element = price_spans = web_price_widget = None
+
+
+def _get_product_name(soup: BeautifulSoup) -> str:
+    """Извлекает название товара."""
+    try:
+        heading_div = soup.select_one("div[data-widget='webProductHeading']")
+        if isinstance(heading_div, Tag):
+            title_element = heading_div.find("h1")
+            if isinstance(title_element, Tag):
+                return title_element.text.strip().replace("\t", "").replace("\n", " ")
+        return ""
+    except Exception as e:
+        logger.warning(f"Ошибка при извлечении названия товара: {e}")
+        return ""
+
+
+def _get_salesman_name(soup: BeautifulSoup) -> Optional[str]:
+    """Извлекает имя продавца."""
+    try:
+        for element in soup.select("a[href*='/seller/']"):
+            href = element.get("href", "").lower()
+            text = element.text.strip()
+            if "reviews" not in href and "info" not in href and len(text) >= 2:
+                return text
+        return None
+    except Exception as e:
+        logger.warning(f"Ошибка при извлечении имени продавца: {e}")
+        return None
+
+
+def _get_product_brand(soup: BeautifulSoup) -> Optional[str]:
+    """Извлекает бренд товара."""
+    try:
+        breadcrumbs = soup.select_one("div[data-widget='breadCrumbs']")
+        if breadcrumbs:
+            last_item = breadcrumbs.select_one("li:last-child")
+            if last_item:
+                brand_tag = last_item.find("span")
+                if brand_tag:
+                    return brand_tag.get_text(strip=True)
+        return None
+    except Exception as e:
+        logger.warning(f"Ошибка при извлечении бренда: {e}")
+        return None
+
+
+def parse_widget_states(raw_states: dict[str, str]) -> dict[str, dict]:
+    """Разбирает JSON-состояния виджетов, пропуская повреждённые."""
+    states = {}
+    for name, raw in raw_states.items():
+        try:
+            state = json.loads(raw)
+        except (TypeError, ValueError):
+            logger.debug(f"Не удалось разобрать состояние виджета {name}")
+            continue
+        if isinstance(state, dict):
+            states[name] = state
+    return states
+
+
+def _find_value(obj: Any, keys: tuple[str, ...]) -> Optional[Any]:
+    """Ищет первое непустое значение по одному из ключей на любой глубине."""
+    if isinstance(obj, dict):
+        for key in keys:
+            value = obj.get(key)
+            if value not in (None, "", [], {}):
+                return value
+        children = obj.values()
+    elif isinstance(obj, list):
+        children = obj
+    else:
+        return None
+    for child in children:
+        if isinstance(child, (dict, list)):
+            value = _find_value(child, keys)
+            if value is not None:
+                return value
+    return None
+
+
+def _text(value: Any) -> Optional[str]:
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def _price_fields(state: dict) -> dict[str, Any]:
+    return {
+        "Цена с картой озона": _text(state.get("cardPrice")),
+        "Цена со скидкой": _text(state.get("price")),
+        "Цена": _text(state.get("originalPrice")),
+    }
+
+
+def _score_fields(state: dict) -> dict[str, Any]:
+    text = _text(_find_value(state, ("text",)))
+    if text and " • " in text:
+        stars, reviews = text.split(" • ", 1)
+        return {"Рейтинг": stars.strip(), "Отзывы": reviews.strip()}
+    stars = _find_value(state, ("totalScore", "score", "rating"))
+    reviews = _find_value(state, ("reviewsCount", "reviews"))
+    return {"Рейтинг": stars, "Отзывы": reviews}
+
+
+def _seller_fields(state: dict) -> dict[str, Optional[str]]:
+    link = _find_value(state, ("link", "url", "sellerLink"))
+    return {
+        "Продавец": _text(_find_value(state, ("name", "sellerName", "title"))),
+        "Ссылка на продавца": link if isinstance(link, str) and "/seller/" in link else None,
+    }
+
+
+def _brand_field(state: dict) -> Optional[str]:
+    crumbs = state.get("breadcrumbs")
+    if isinstance(crumbs, list) and crumbs and isinstance(crumbs[-1], dict):
+        return _text(crumbs[-1].get("text"))
+    return None
+
+
+def extract_from_states(states: dict[str, dict]) -> dict[str, Any]:
+    """Извлекает поля товара из состояний виджетов; отсутствующие поля равны None."""
+    fields: dict[str, Any] = {
+        "Артикул": None,
+        "Название товара": None,
+        "Бренд": None,
+        "Цена с картой озона": None,
+        "Цена со скидкой": None,
+        "Цена": None,
+        "Рейтинг": None,
+        "Отзывы": None,
+        "Продавец": None,
+        "Ссылка на продавца": None,
+    }
+    try:
+        if "webPrice" in states:
+            fields.update(_price_fields(states["webPrice"]))
+        if "webProductHeading" in states:
+            title = _text(states["webProductHeading"].get("title"))
+            fields["Название товара"] = title.replace("\t", "").replace("\n", " ") if title else None
+        if "webSingleProductScore" in states:
+            fields.update(_score_fields(states["webSingleProductScore"]))
+        if "webCurrentSeller" in states:
+            fields.update(_seller_fields(states["webCurrentSeller"]))
+        if "webDetailSKU" in states:
+            sku = _find_value(states["webDetailSKU"], ("sku",))
+            fields["Артикул"] = str(sku) if sku is not None else None
+        if "breadCrumbs" in states:
+            fields["Бренд"] = _brand_field(states["breadCrumbs"])
+    except Exception as e:
+        logger.warning(f"Ошибка при извлечении данных из состояний виджетов: {e}")
+    return fields
+
+
+def needs_dom_fallback(fields: dict[str, Optional[str]]) -> bool:
+    """Проверяет, нужен ли разбор HTML для недостающих полей."""
+    return any(fields.get(name) is None for name in DOM_FALLBACK_FIELDS)
+
+
+def extract_product_timed(
+    raw_states: dict[str, str], html: Optional[str] = None
+) -> Tuple[dict[str, Any], dict[str, float]]:
+    """Извлекает поля товара и возвращает вместе с длительностью каждого этапа разбора.
+
+    Цены возвращаются целыми копейками, рейтинг — дробным числом, отзывы — целым.
+    """
+    timings: dict[str, float] = {}
+
+    def timed(name: str, func: Callable, *args: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings[name] = time.perf_counter() - started
+
+    fields = timed(
+        "widget_state_parse", lambda: extract_from_states(parse_widget_states(raw_states))
+    )
+    if html is None or not needs_dom_fallback(fields):
+        return timed("normalize", normalize_fields, fields), timings
+
+    # Дерево из нескольких виджетов небольшое, его освобождает обычная сборка мусора
+    soup = timed("bs4_parse", make_soup, html)
+    if fields["Название товара"] is None:
+        fields["Название товара"] = timed("_get_product_name", _get_product_name, soup)
+    if fields["Рейтинг"] is None and fields["Отзывы"] is None:
+        fields["Рейтинг"], fields["Отзывы"] = timed(
+            "_get_stars_reviews", _get_stars_reviews, soup
+        )
+    if fields["Цена со скидкой"] is None:
+        fields["Цена с картой озона"] = timed("_get_sale_price", _get_sale_price, soup)
+        fields["Цена со скидкой"], fields["Цена"] = timed(
+            "_get_full_prices", _get_full_prices, soup
+        )
+    if fields["Продавец"] is None:
+        fields["Продавец"] = timed("_get_salesman_name", _get_salesman_name, soup)
+    if fields["Бренд"] is None:
+        fields["Бренд"] = timed("_get_product_brand", _get_product_brand, soup)
+    return timed("normalize", normalize_fields, fields), timings
+
+
+def extract_product(
+    raw_states: dict[str, str], html: Optional[str] = None
+) -> dict[str, Any]:
+    """Извлекает поля товара из состояний виджетов и, если передан HTML, из DOM."""
+    return extract_product_timed(raw_states, html)[0]
+
+
+def parse_seller_modal(html: str) -> Tuple[Optional[str], Optional[str]]:
+    """Извлекает данные о продавце и ИНН из HTML модального окна продавца."""
+    soup = BeautifulSoup(html, "lxml")
+    modal_div = soup.select_one("div[data-popper-placement^='top']") or soup
+    paragraphs = modal_div.find_all("p")
+    if not paragraphs:
+        return None, None
+    seller_details = ""
+    for i in range(len(paragraphs) - 2):
+        seller_details += paragraphs[i].get_text(strip=True)
+    inn = paragraphs[-2].get_text(strip=True) if len(paragraphs) >= 2 else None
+    return seller_details, inn
+
+
+class ParseExecutor(ProcessPoolExecutor):
+    """Пул процессов разбора, записи лога которых выводит основной процесс.
+
+    Процессы запускаются через spawn, как воркеры utils.sharding: при fork каждый
+    потомок получил бы свою копию очереди QueueHandler основного процесса, и его
+    записи терялись бы. Записи потомков идут через очередь multiprocessing.
+    """
+
+    def __init__(self, workers: int):
+        context = multiprocessing.get_context("spawn")
+        self.log_queue = context.Queue()
+        self._log_listener = relay_worker_logs(self.log_queue)
+        super().__init__(
+            max_workers=workers,
+            mp_context=context,
+            initializer=configure_worker_logging,
+            initargs=(self.log_queue, logger.getEffectiveLevel()),
+        )
+
+    def shutdown(self, wait: bool = True, **kwargs: Any) -> None:
+        super().shutdown(wait=wait, **kwargs)
+        self._log_listener.stop()
+
+
+def create_parse_executor(workers: int) -> Optional[Executor]:
+    """Создаёт пул процессов для разбора; при workers <= 0 разбор идёт в основном потоке."""
+    if workers <= 0:
+        return None
+    return ParseExecutor(workers)
+
+
+async def run_parser(executor: Optional[Executor], func: Callable, *args: Any) -> Any:
+    """Выполняет функцию разбора в пуле, не блокируя цикл событий."""
+    if executor is None:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
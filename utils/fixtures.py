@@ -0,0 +1,86 @@
+import json
+import os
+from typing import Iterator, Optional
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+PAGE_FILE = "page.html"
+STATES_FILE = "states.json"
+SELLER_FILE = "seller.html"
+EXPECTED_FILE = "expected.json"
+
+
+class FixtureRecorder:
+    """Сохраняет HTML страниц товаров и модального окна продавца для офлайн-проверок.
+
+    Каждый товар — каталог <dir>/<id>/ с page.html, states.json, seller.html
+    и expected.json (поля, извлечённые при записи; их можно поправить вручную).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.saved = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def save(
+        self,
+        fixture_id: str,
+        html: str,
+        raw_states: dict[str, str],
+        seller_html: Optional[str],
+        row: dict,
+    ) -> None:
+        fixture_dir = os.path.join(self.directory, fixture_id)
+        try:
+            os.makedirs(fixture_dir, exist_ok=True)
+            with open(os.path.join(fixture_dir, PAGE_FILE), "w", encoding="utf-8") as f:
+                f.write(html)
+            with open(os.path.join(fixture_dir, STATES_FILE), "w", encoding="utf-8") as f:
+                json.dump(raw_states, f, ensure_ascii=False)
+            if seller_html:
+                with open(os.path.join(fixture_dir, SELLER_FILE), "w", encoding="utf-8") as f:
+                    f.write(seller_html)
+            with open(os.path.join(fixture_dir, EXPECTED_FILE), "w", encoding="utf-8") as f:
+                json.dump(row, f, ensure_ascii=False, indent=2, default=str)
+            self.saved += 1
+        except Exception as e:
+            logger.warning(f"Ошибка при сохранении фикстуры {fixture_id}: {e}")
+
+
+class Fixture:
+    """Сохранённая страница товара, загруженная с диска."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, PAGE_FILE), "r", encoding="utf-8") as f:
+            self.html = f.read()
+        self.raw_states: dict[str, str] = {}
+        states_path = os.path.join(path, STATES_FILE)
+        if os.path.exists(states_path):
+            with open(states_path, "r", encoding="utf-8") as f:
+                self.raw_states = json.load(f)
+        self.seller_html: Optional[str] = None
+        seller_path = os.path.join(path, SELLER_FILE)
+        if os.path.exists(seller_path):
+            with open(seller_path, "r", encoding="utf-8") as f:
+                self.seller_html = f.read()
+        self.expected: dict = {}
+        expected_path = os.path.join(path, EXPECTED_FILE)
+        if os.path.exists(expected_path):
+            with open(expected_path, "r", encoding="utf-8") as f:
+                self.expected = json.load(f)
+
+
+def iter_fixtures(directory: str, limit: int = 0) -> Iterator[Fixture]:
+    """Перебирает сохранённые фикстуры в порядке имён каталогов."""
+    count = 0
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.exists(os.path.join(path, PAGE_FILE)):
+            continue
+        yield Fixture(path)
+        count += 1
+        if limit and count >= limit:
+            return
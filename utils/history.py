@@ -0,0 +1,119 @@
+import json
+import sqlite3
+import time
+from utils.logger import setup_logger
+from utils.normalize import PRICE_COLUMNS, coerce_value
+
+logger = setup_logger()
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS products (
+        product_id TEXT PRIMARY KEY,
+        url TEXT,
+        first_seen REAL NOT NULL,
+        last_scraped REAL NOT NULL,
+        row TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS price_changes (
+        product_id TEXT NOT NULL,
+        ts REAL NOT NULL,
+        price_column TEXT NOT NULL,
+        old_value INTEGER,
+        new_value INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS price_changes_product ON price_changes (product_id, ts)",
+)
+
+
+class PriceHistory:
+    """История результатов по id товара для инкрементального режима.
+
+    Хранит последнюю строку и время сбора каждого товара, а изменения цен
+    (в копейках) дописывает в таблицу price_changes, в том числе первое наблюдение
+    со старым значением NULL.
+    """
+
+    def __init__(self, path: str = "history.sqlite"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            for statement in _SCHEMA:
+                self.connection.execute(statement)
+        self.changes = 0
+        logger.info(f"Открыта история цен {path}")
+
+    def select_for_update(
+        self, products: dict[str, str], stale_hours: float
+    ) -> dict[str, str]:
+        """Оставляет новые товары и товары, собранные раньше stale_hours часов назад."""
+        cutoff = time.time() - stale_hours * 3600
+        last_scraped: dict[str, float] = {}
+        ids = list(products)
+        # Запрос по частям: у SQLite ограничено число параметров
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            last_scraped.update(
+                self.connection.execute(
+                    "SELECT product_id, last_scraped FROM products WHERE product_id IN (%s)"
+                    % ", ".join("?" for _ in chunk),
+                    chunk,
+                ).fetchall()
+            )
+        selected = {
+            product_id: url
+            for product_id, url in products.items()
+            if last_scraped.get(product_id, 0.0) < cutoff
+        }
+        new = sum(1 for product_id in selected if product_id not in last_scraped)
+        logger.info(
+            f"Инкрементальный режим: новых товаров {new}, устаревших {len(selected) - new}, "
+            f"пропущено свежих {len(products) - len(selected)} (порог {stale_hours:g} ч)"
+        )
+        return selected
+
+    def record(self, product_id: str, row: dict) -> None:
+        """Сохраняет строку товара и изменения его цен одной транзакцией."""
+        now = time.time()
+        previous = self.connection.execute(
+            "SELECT row FROM products WHERE product_id = ?", (product_id,)
+        ).fetchone()
+        old_row = json.loads(previous[0]) if previous else {}
+        changes = []
+        for column in PRICE_COLUMNS:
+            old_value = coerce_value(column, old_row.get(column))
+            new_value = coerce_value(column, row.get(column))
+            if new_value != old_value:
+                changes.append((product_id, now, column, old_value, new_value))
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO products (product_id, url, first_seen, last_scraped, row) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (product_id) DO UPDATE SET "
+                "url = excluded.url, last_scraped = excluded.last_scraped, row = excluded.row",
+                (
+                    product_id,
+                    row.get("Ссылка на товар"),
+                    now,
+                    now,
+                    json.dumps(row, ensure_ascii=False, default=str),
+                ),
+            )
+            if changes:
+                self.connection.executemany(
+                    "INSERT INTO price_changes VALUES (?, ?, ?, ?, ?)", changes
+                )
+        if previous and changes:
+            self.changes += 1
+            logger.debug(
+                f"Цена товара {product_id} изменилась: "
+                + ", ".join(f"{column}: {old} → {new}" for _, _, column, old, new in changes)
+            )
+
+    def close(self) -> None:
+        logger.info(f"История цен: товаров с изменившейся ценой за запуск {self.changes}")
+        self.connection.close()
@@ -0,0 +1,169 @@
+import asyncio
+import json
+from http.cookies import SimpleCookie
+from typing import Any, Optional
+from urllib.parse import quote, urlsplit
+from playwright.async_api import Page
+from utils.logger import setup_logger
+from utils.errors import ANTIBOT_URL_MARKERS, CaptchaError, ProductNotFoundError
+from utils.urls import OZON_ORIGIN, PAGE_API_URL
+from utils.waits import wait_for_any
+from utils.widget_state import PRODUCT_READY_SELECTORS, PRODUCT_WIDGETS, states_from_page_json
+
+logger = setup_logger()
+
+# Статусы, которыми Ozon отвечает на запросы без действующей сессии
+CHALLENGE_STATUSES = (401, 403, 429)
+
+
+class HttpFetcher:
+    """Получение состояний виджетов товара HTTP-запросами с куки браузерной сессии.
+
+    После прохождения антибот-проверки в браузере куки и User-Agent переносятся
+    в пул keep-alive соединений aiohttp, и страницы товаров запрашиваются через
+    JSON-эндпоинт без навигации, JS и подресурсов. Если сервер снова требует
+    проверку, сессия обновляется переходом браузера на страницу товара.
+    Браузерная страница одна, поэтому все её использования идут под browser_lock.
+    """
+
+    def __init__(
+        self,
+        page: Page,
+        concurrency: int = 16,
+        timeout: float = 30.0,
+        max_pages: int = 3,
+        max_refreshes: int = 3,
+    ):
+        try:
+            import aiohttp
+        except ImportError as e:
+            raise RuntimeError("Для режима http установите пакет aiohttp") from e
+        self.aiohttp = aiohttp
+        self.page = page
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.max_refreshes = max_refreshes
+        self.session = None
+        self.requests = 0
+        self.refreshes = 0
+        self._failed_refreshes = 0
+        self._generation = 0
+        self.browser_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Открывает пул соединений с куки и User-Agent текущей сессии браузера."""
+        user_agent = await self.page.evaluate("navigator.userAgent")
+        connector = self.aiohttp.TCPConnector(
+            limit=self.concurrency, ttl_dns_cache=300, keepalive_timeout=60
+        )
+        self.session = self.aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.aiohttp.ClientTimeout(total=self.timeout),
+            headers={
+                "User-Agent": user_agent,
+                "Accept": "application/json",
+                "Accept-Language": "ru-RU,ru;q=0.9",
+                "Referer": f"{OZON_ORIGIN}/",
+            },
+        )
+        await self._load_cookies()
+        logger.info(f"Режим http: {self.concurrency} соединений, куки взяты из браузера")
+
+    async def _load_cookies(self) -> None:
+        cookies = SimpleCookie()
+        for cookie in await self.page.context.cookies(OZON_ORIGIN):
+            cookies[cookie["name"]] = cookie["value"]
+            cookies[cookie["name"]]["domain"] = cookie.get("domain", "")
+            cookies[cookie["name"]]["path"] = cookie.get("path", "/")
+        self.session.cookie_jar.clear()
+        self.session.cookie_jar.update_cookies(cookies)
+
+    async def _get_json(self, path: str) -> Optional[dict[str, Any]]:
+        """Запрашивает JSON страницы; None означает антибот-проверку вместо данных."""
+        self.requests += 1
+        async with self.session.get(PAGE_API_URL + quote(path, safe="")) as response:
+            if response.status == 404:
+                raise ProductNotFoundError("Товар не найден (404)")
+            if response.status in CHALLENGE_STATUSES or any(
+                marker in str(response.url) for marker in ANTIBOT_URL_MARKERS
+            ):
+                return None
+            response.raise_for_status()
+            text = await response.text()
+        # Вместо JSON антибот отдаёт HTML-страницу проверки
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            return None
+        return payload if isinstance(payload, dict) else None
+
+    async def refresh_session(self, url: str, generation: int) -> None:
+        """Проходит проверку в браузере на странице товара и обновляет куки пула.
+
+        Если пока запрос ждал блокировки, сессию уже обновил другой воркер,
+        повторного перехода не происходит.
+        """
+        async with self.browser_lock:
+            if generation != self._generation:
+                return
+            if self._failed_refreshes >= self.max_refreshes:
+                raise CaptchaError(
+                    f"Сессия не восстановлена после {self.max_refreshes} обновлений подряд"
+                )
+            self._failed_refreshes += 1
+            self.refreshes += 1
+            logger.info("Антибот-проверка в режиме http, обновление сессии через браузер")
+            await self.page.goto(url, wait_until="domcontentloaded", timeout=30000)
+            await wait_for_any(
+                self.page, PRODUCT_READY_SELECTORS, timeout=15000, name="проверка сессии"
+            )
+            await self._load_cookies()
+            self._generation += 1
+
+    async def fetch_states(self, url: str, capture: Optional[dict] = None) -> dict[str, str]:
+        """Возвращает неразобранные состояния виджетов товара, как fetch_widget_states.
+
+        Часть виджетов приходит в продолжении страницы (nextPage), поэтому оно
+        запрашивается, пока нужные виджеты не найдены, но не больше max_pages раз.
+        Если передан словарь capture, в нём под ключом "widget_states" собираются
+        состояния всех виджетов загруженных частей страницы (для архива).
+        """
+        path = urlsplit(url).path
+        states: dict[str, str] = {}
+        out_of_stock = False
+        pages_loaded = 0
+        while path and pages_loaded < self.max_pages:
+            generation = self._generation
+            payload = await self._get_json(path)
+            if payload is None:
+                await self.refresh_session(url, generation)
+                payload = await self._get_json(path)
+                if payload is None:
+                    raise CaptchaError(f"Антибот-проверка в режиме http ({url})")
+            self._failed_refreshes = 0
+            pages_loaded += 1
+            for name, raw in states_from_page_json(payload).items():
+                states.setdefault(name, raw)
+            widget_states = payload.get("widgetStates") or {}
+            if capture is not None and isinstance(widget_states, dict):
+                for key, raw in widget_states.items():
+                    capture.setdefault("widget_states", {}).setdefault(key, raw)
+            out_of_stock = out_of_stock or any(
+                key.startswith("webOutOfStock") for key in widget_states
+            )
+            if all(name in states for name in PRODUCT_WIDGETS):
+                break
+            next_page = payload.get("nextPage")
+            path = next_page if isinstance(next_page, str) else None
+        if out_of_stock and "webPrice" not in states and "webProductHeading" not in states:
+            raise ProductNotFoundError("Товар закончился")
+        return states
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        logger.info(
+            f"Режим http: запросов {self.requests}, обновлений сессии через браузер {self.refreshes}"
+        )
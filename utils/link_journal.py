@@ -0,0 +1,88 @@
+import os
+from typing import Iterable
+from utils.logger import setup_logger
+from utils.urls import canonical_product_url
+
+logger = setup_logger()
+
+
+class LinkJournal:
+    """Журнал собранных ссылок только на дозапись с сохранением порядка появления."""
+
+    def __init__(self, path: str, fsync_every: int = 100):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._links: dict[str, None] = {}
+        self._unsynced = 0
+        self._needs_compaction = False
+
+        if os.path.exists(path):
+            lines = 0
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        lines += 1
+                        canonical = canonical_product_url(line.strip())
+                        if canonical:
+                            self._links[canonical] = None
+                logger.info(f"Загружено {len(self._links)} ссылок из {path}")
+            except Exception as e:
+                logger.warning(f"Ошибка при чтении {path}: {e}")
+            # Старые файлы могут содержать дубликаты и ссылки с ?at=
+            self._needs_compaction = lines != len(self._links)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return len(self._links)
+
+    def __contains__(self, link: str) -> bool:
+        return link in self._links
+
+    def links(self, limit: int = 0) -> list[str]:
+        """Возвращает ссылки в порядке появления, не больше limit (0 — все)."""
+        links = list(self._links)
+        return links[:limit] if limit > 0 else links
+
+    def add(self, links: Iterable[str]) -> list[str]:
+        """Дописывает в журнал только новые ссылки и возвращает их."""
+        new_links = []
+        for link in links:
+            canonical = canonical_product_url(link)
+            if canonical and canonical not in self._links:
+                self._links[canonical] = None
+                new_links.append(canonical)
+        if new_links:
+            self._file.writelines(f"{link}\n" for link in new_links)
+            self._unsynced += len(new_links)
+            if self._unsynced >= self.fsync_every:
+                self.sync()
+        return new_links
+
+    def sync(self) -> None:
+        """Сбрасывает дописанные ссылки на диск."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def compact(self) -> None:
+        """Переписывает файл без дубликатов, если при загрузке они были найдены."""
+        if not self._needs_compaction:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(f"{link}\n" for link in self._links)
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._needs_compaction = False
+        logger.info(f"Файл {self.path} сжат до {len(self._links)} ссылок")
+
+    def close(self) -> None:
+        """Завершает запись и сжимает журнал."""
+        if self._file.closed:
+            return
+        self.sync()
+        self.compact()
+        self._file.close()
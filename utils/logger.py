@@ -1,22 +1,111 @@
+import atexit
 import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
 
+LOGGER_NAME = "OzonParser"
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
 
-def setup_logger(log_file: str = "parser.log") -> logging.Logger:
-    """Настраивает логгер для записи в файл и консоль."""
-    logger = logging.getLogger("OzonParser")
-    logger.setLevel(logging.INFO)
-    logger.handlers.clear()
+_listener: Optional[QueueListener] = None
 
-    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 
-    file_handler = logging.FileHandler(log_file, mode="w", encoding="utf-8")
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+def setup_logger() -> logging.Logger:
+    """Возвращает логгер парсера; обработчики настраивает configure_logging."""
+    return logging.getLogger(LOGGER_NAME)
+
 
+def configure_logging(
+    log_file: str = "parser.log",
+    level: str = "INFO",
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+) -> logging.Logger:
+    """Настраивает запись логов в файл с ротацией и в консоль через очередь.
+
+    Вызывается один раз из точки входа. Логгер только кладёт записи в очередь,
+    а запись в файл и консоль выполняет отдельный поток QueueListener, поэтому
+    ввод-вывод не задерживает сбор. Лог предыдущего запуска не затирается:
+    при старте он переносится в parser.log.1 (старые копии сдвигаются).
+    """
+    global _listener
+    logger = setup_logger()
+    if _listener is not None:
+        return logger
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+    if backup_count and os.path.getsize(log_file) > 0:
+        file_handler.doRollover()
+    file_handler.setFormatter(formatter)
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
 
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    logger.handlers.clear()
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+    _listener = QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(stop_logging)
     return logger
+
+
+def stop_logging() -> None:
+    """Дописывает оставшиеся в очереди записи и останавливает поток логирования."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    setup_logger().handlers.clear()
+
+
+class _PrefixFilter(logging.Filter):
+    """Добавляет к сообщению префикс, например номер процесса-воркера."""
+
+    def __init__(self, prefix: str):
+        super().__init__()
+        self.prefix = prefix
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = f"{self.prefix}{record.getMessage()}"
+        record.args = None
+        return True
+
+
+class _RelayHandler(logging.Handler):
+    """Передаёт записи из дочерних процессов обработчикам логгера основного процесса."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        setup_logger().handle(record)
+
+
+def configure_worker_logging(log_queue, level: int = logging.INFO, prefix: str = "") -> logging.Logger:
+    """Настраивает логирование дочернего процесса: записи уходят в очередь основного."""
+    logger = setup_logger()
+    handler = QueueHandler(log_queue)
+    if prefix:
+        handler.addFilter(_PrefixFilter(prefix))
+    logger.handlers.clear()
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+def relay_worker_logs(log_queue) -> QueueListener:
+    """Запускает поток, выводящий записи дочерних процессов обработчиками основного."""
+    listener = QueueListener(log_queue, _RelayHandler())
+    listener.start()
+    return listener
@@ -0,0 +1,79 @@
+import gc
+import os
+import sys
+import time
+from typing import Optional
+from utils.logger import setup_logger
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = setup_logger()
+
+_MB = 1_048_576
+
+
+def current_rss() -> Optional[int]:
+    """Возвращает резидентную память процесса в байтах или None, если её не узнать."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+    return None
+
+
+class MemoryMonitor:
+    """Следит за памятью процесса парсера и запускает сборку мусора только при превышении порога.
+
+    После сборки, которая не опустила память ниже порога, порог поднимается,
+    чтобы не собирать мусор после каждого товара.
+    """
+
+    def __init__(self, high_water_mb: float = 512.0):
+        self.high_water = int(high_water_mb * _MB)
+        self.threshold = self.high_water
+        self.peak = 0
+        self.start = current_rss()
+        self.collections = 0
+        self.collect_seconds = 0.0
+        self.enabled = self.start is not None and high_water_mb > 0
+        if self.start is None:
+            logger.info("Память процесса недоступна (нужен psutil), контроль памяти отключён")
+
+    def check(self) -> Optional[int]:
+        """Проверяет память после очередного товара и при необходимости собирает мусор."""
+        if not self.enabled:
+            return None
+        rss = current_rss()
+        if rss is None:
+            return None
+        self.peak = max(self.peak, rss)
+        if rss < self.threshold:
+            return rss
+        started = time.perf_counter()
+        gc.collect()
+        self.collect_seconds += time.perf_counter() - started
+        self.collections += 1
+        after = current_rss() or rss
+        self.threshold = max(self.high_water, int(after * 1.25))
+        logger.info(
+            f"Память {rss / _MB:.0f} МБ выше порога, после сборки мусора {after / _MB:.0f} МБ, "
+            f"следующий порог {self.threshold / _MB:.0f} МБ"
+        )
+        return after
+
+    def log_summary(self) -> None:
+        if not self.enabled:
+            return
+        rss = current_rss() or 0
+        logger.info(
+            f"Память парсера: в начале {self.start / _MB:.0f} МБ, пик {self.peak / _MB:.0f} МБ, "
+            f"в конце {rss / _MB:.0f} МБ; сборок мусора по порогу: {self.collections} "
+            f"({self.collect_seconds * 1000:.0f} мс)"
+        )
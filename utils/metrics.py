@@ -0,0 +1,169 @@
+import json
+import math
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль по методу ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class ProductTimer:
+    """Длительности этапов обработки одного товара."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.status = "ok"
+        self.attempts = 0
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class ProgressLog:
+    """Сводная строка прогресса не чаще раза в interval секунд вместо строки на товар."""
+
+    def __init__(self, total: int, interval: float = 10.0):
+        self.total = total
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.last_logged = self.started
+        self.processed = 0
+        self.failed = 0
+
+    def update(self, ok: bool = True) -> None:
+        self.processed += 1
+        if not ok:
+            self.failed += 1
+        now = time.perf_counter()
+        if now - self.last_logged >= self.interval or self.processed == self.total:
+            self.last_logged = now
+            self.log()
+
+    def log(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        rate = self.processed / elapsed * 60 if elapsed > 0 else 0.0
+        remaining = (self.total - self.processed) / rate if rate > 0 else 0.0
+        percent = self.processed / self.total * 100 if self.total else 100.0
+        logger.info(
+            f"Прогресс: {self.processed}/{self.total} ({percent:.0f}%), "
+            f"неудачных {self.failed}, {rate:.1f} товаров/мин, осталось ≈{remaining:.0f} мин"
+        )
+
+
+class RunMetrics:
+    """Метрики запуска: JSON-строки по каждому товару и итоговая сводка."""
+
+    def __init__(self, path: Optional[str] = None, prometheus_path: Optional[str] = None):
+        self.path = path
+        self.prometheus_path = prometheus_path
+        self.run_id = time.strftime("%Y%m%dT%H%M%S")
+        self.started = time.perf_counter()
+        self.stage_durations: dict[str, list[float]] = {}
+        self.totals: list[float] = []
+        self.statuses: dict[str, int] = {}
+        self._file = open(path, "a", encoding="utf-8") if path else None
+
+    def start_product(self, url: str) -> ProductTimer:
+        return ProductTimer(url)
+
+    def record_stage(self, name: str, seconds: float) -> None:
+        """Учитывает этап, не привязанный к одному товару (например, запись результатов)."""
+        self.stage_durations.setdefault(name, []).append(seconds)
+
+    def finish_product(self, timer: ProductTimer) -> None:
+        total = timer.total()
+        self.totals.append(total)
+        self.statuses[timer.status] = self.statuses.get(timer.status, 0) + 1
+        for name, seconds in timer.stages.items():
+            self.record_stage(name, seconds)
+        if self._file:
+            record = {
+                "run": self.run_id,
+                "ts": time.time(),
+                "url": timer.url,
+                "status": timer.status,
+                "attempts": timer.attempts,
+                "total": round(total, 4),
+                "stages": {name: round(seconds, 4) for name, seconds in timer.stages.items()},
+            }
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def products_per_minute(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return len(self.totals) / elapsed * 60 if elapsed > 0 else 0.0
+
+    def log_summary(self) -> None:
+        """Выводит p50/p95/p99 по этапам и скорость обработки."""
+        if not self.totals:
+            return
+        logger.info(
+            f"Товаров: {len(self.totals)} ({self.statuses}), "
+            f"{self.products_per_minute():.1f} товаров/мин, "
+            f"на товар p50 {percentile(self.totals, 50):.2f} с, "
+            f"p95 {percentile(self.totals, 95):.2f} с, p99 {percentile(self.totals, 99):.2f} с"
+        )
+        for name, durations in sorted(
+            self.stage_durations.items(), key=lambda item: -sum(item[1])
+        ):
+            logger.info(
+                f"  {name}: n={len(durations)}, сумма {sum(durations):.1f} с, "
+                f"p50 {percentile(durations, 50) * 1000:.0f} мс, "
+                f"p95 {percentile(durations, 95) * 1000:.0f} мс, "
+                f"p99 {percentile(durations, 99) * 1000:.0f} мс"
+            )
+
+    def write_prometheus(self) -> None:
+        """Записывает метрики в текстовом формате Prometheus (для node_exporter textfile)."""
+        if not self.prometheus_path:
+            return
+        lines = [
+            "# TYPE ozon_parser_products_total counter",
+            *(
+                f'ozon_parser_products_total{{status="{status}"}} {count}'
+                for status, count in self.statuses.items()
+            ),
+            "# TYPE ozon_parser_products_per_minute gauge",
+            f"ozon_parser_products_per_minute {self.products_per_minute():.3f}",
+            "# TYPE ozon_parser_stage_seconds summary",
+        ]
+        for name, durations in self.stage_durations.items():
+            for q in (50, 95, 99):
+                lines.append(
+                    f'ozon_parser_stage_seconds{{stage="{name}",quantile="{q / 100}"}} '
+                    f"{percentile(durations, q):.6f}"
+                )
+            lines.append(f'ozon_parser_stage_seconds_sum{{stage="{name}"}} {sum(durations):.6f}')
+            lines.append(f'ozon_parser_stage_seconds_count{{stage="{name}"}} {len(durations)}')
+        with open(self.prometheus_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def close(self) -> None:
+        self.log_summary()
+        self.write_prometheus()
+        if self._file:
+            self._file.close()
+            self._file = None
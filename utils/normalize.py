@@ -0,0 +1,86 @@
+import re
+from typing import Any, Optional
+
+# Модуль выполняется в процессах пула разбора, поэтому не настраивает логирование
+
+PRICE_COLUMNS = ("Цена с картой озона", "Цена со скидкой", "Цена")
+RATING_COLUMN = "Рейтинг"
+REVIEWS_COLUMN = "Отзывы"
+
+# Тип значения столбца в результатах: цены в копейках, рейтинг дробный, отзывы целые
+COLUMN_TYPES = {
+    **{column: "int" for column in PRICE_COLUMNS},
+    RATING_COLUMN: "float",
+    REVIEWS_COLUMN: "int",
+}
+
+# \s в Python совпадает и с тонким (U+2009), и с неразрывным (U+00A0) пробелом в числах Ozon
+_PRICE_RE = re.compile(r"\d[\d\s]*(?:[.,]\d{1,2})?")
+_RATING_RE = re.compile(r"\d+(?:[.,]\d+)?")
+_COUNT_RE = re.compile(r"\d[\d\s]*")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def parse_price_kopecks(value: Any) -> Optional[int]:
+    """Цена в копейках: «1 234,50 ₽» → 123450, число рублей → рубли × 100."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return round(value * 100)
+    if not isinstance(value, str):
+        return None
+    match = _PRICE_RE.search(value)
+    if not match:
+        return None
+    rubles, _, kopecks = _SPACES_RE.sub("", match.group()).replace(",", ".").partition(".")
+    return int(rubles) * 100 + int(kopecks.ljust(2, "0") if kopecks else 0)
+
+
+def parse_rating(value: Any) -> Optional[float]:
+    """Рейтинг: «4.8», «4,8 из 5» → 4.8."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = _RATING_RE.search(value)
+    return float(match.group().replace(",", ".")) if match else None
+
+
+def parse_count(value: Any) -> Optional[int]:
+    """Количество: «1 234 отзыва» → 1234."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not isinstance(value, str):
+        return None
+    match = _COUNT_RE.search(value)
+    return int(_SPACES_RE.sub("", match.group())) if match else None
+
+
+_PARSERS = {"int": parse_count, "float": parse_rating}
+
+
+def normalize_value(column: str, value: Any) -> Any:
+    """Приводит значение столбца к типу схемы; нетипизированные столбцы не меняются."""
+    if column in PRICE_COLUMNS:
+        return parse_price_kopecks(value)
+    parser = _PARSERS.get(COLUMN_TYPES.get(column, ""))
+    return parser(value) if parser else value
+
+
+def coerce_value(column: str, value: Any) -> Any:
+    """Значение из готовой строки результата: числа уже нормализованы, строки прежних запусков разбираются."""
+    if isinstance(value, str) and column in COLUMN_TYPES:
+        return normalize_value(column, value)
+    return value
+
+
+def normalize_fields(fields: dict[str, Any]) -> dict[str, Any]:
+    """Один проход по извлечённым полям: цены, рейтинг и отзывы становятся числами."""
+    for column in COLUMN_TYPES:
+        if column in fields:
+            fields[column] = normalize_value(column, fields[column])
+    return fields
@@ -0,0 +1,182 @@
+import json
+import os
+from typing import Iterable, Optional, Tuple
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font
+from openpyxl.utils import get_column_letter
+from utils.logger import setup_logger
+from utils.normalize import PRICE_COLUMNS
+
+logger = setup_logger()
+
+KEY_COLUMN = "Артикул"
+PRICE_FORMAT = "#,##0.00"
+
+
+def journal_path_for(filename: str) -> str:
+    """Возвращает путь к JSONL-журналу для выходного Excel-файла."""
+    return f"{os.path.splitext(filename)[0]}.journal.jsonl"
+
+
+def _last_lines_by_key(journal_file: str) -> dict[str, int]:
+    """Возвращает номер последней строки журнала для каждого артикула."""
+    last_lines: dict[str, int] = {}
+    with open(journal_file, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            if line.strip():
+                key = json.loads(line).get(KEY_COLUMN)
+                if key is not None:
+                    last_lines[str(key)] = line_no
+    return last_lines
+
+
+def _track_row(row: dict, columns: list[str], widths: dict[str, int]) -> None:
+    """Обновляет список столбцов и их ширину по одной строке."""
+    for column, value in row.items():
+        if column not in widths:
+            columns.append(column)
+            widths[column] = len(str(column))
+        if value is not None and value != "":
+            widths[column] = max(widths[column], len(str(value)))
+
+
+def scan_journal(journal_file: str) -> Tuple[list[str], dict[str, int], int]:
+    """Вычисляет столбцы, ширины и число строк журнала за один проход."""
+    columns: list[str] = []
+    widths: dict[str, int] = {}
+    rows_count = 0
+    with open(journal_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                _track_row(json.loads(line), columns, widths)
+                rows_count += 1
+    return columns, widths, rows_count
+
+
+class StreamingExcelWriter:
+    """Потоковая запись строк в JSONL-журнал со сборкой Excel-файла один раз в конце."""
+
+    def __init__(self, filename: str = "ozon_products.xlsx", journal_file: Optional[str] = None):
+        self.filename = filename
+        self.journal_file = journal_file or journal_path_for(filename)
+        self.columns: list[str] = []
+        self.widths: dict[str, int] = {}
+        self.rows_count = 0
+
+        if os.path.exists(self.journal_file):
+            self.columns, self.widths, self.rows_count = scan_journal(self.journal_file)
+            logger.info(f"Загружен журнал {self.journal_file}: {self.rows_count} строк")
+        elif os.path.exists(self.filename):
+            self._import_existing_excel()
+        self._journal = open(self.journal_file, "a", encoding="utf-8")
+
+    def _import_existing_excel(self) -> None:
+        """Однократно переносит строки из старого Excel-файла в журнал."""
+        logger.info(f"Перенос данных из {self.filename} в журнал {self.journal_file}")
+        workbook = load_workbook(self.filename, read_only=True)
+        try:
+            worksheet = workbook["Products"]
+            rows = worksheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header:
+                return
+            with open(self.journal_file, "w", encoding="utf-8") as f:
+                for values in rows:
+                    row = dict(zip(header, values))
+                    _track_row(row, self.columns, self.widths)
+                    f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+                    self.rows_count += 1
+        finally:
+            workbook.close()
+
+    def write_rows(self, rows: Iterable[dict]) -> None:
+        """Дописывает строки в журнал, не перечитывая ранее записанные данные."""
+        written = 0
+        for row in rows:
+            _track_row(row, self.columns, self.widths)
+            self._journal.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            written += 1
+        self._journal.flush()
+        self.rows_count += written
+        logger.debug(f"В журнал {self.journal_file} дописано строк: {written}")
+
+    def buffered(self) -> int:
+        """Число строк, принятых, но ещё не записанных на диск: журнал сбрасывается сразу."""
+        return 0
+
+    def build_excel(self) -> None:
+        """Собирает Excel-файл из журнала в режиме write-only."""
+        self._journal.flush()
+        build_excel_from_journal(
+            self.journal_file, self.filename, columns=self.columns, widths=self.widths
+        )
+
+    def close(self, build: bool = True) -> None:
+        """Закрывает журнал и при необходимости собирает итоговый Excel-файл."""
+        if self._journal.closed:
+            return
+        try:
+            if build and self.rows_count:
+                self.build_excel()
+        finally:
+            self._journal.close()
+
+
+def build_excel_from_journal(
+    journal_file: str,
+    filename: str,
+    columns: Optional[list[str]] = None,
+    widths: Optional[dict[str, int]] = None,
+) -> None:
+    """Собирает Excel-файл из JSONL-журнала, оставляя последнюю строку для каждого артикула."""
+    if columns is None or widths is None:
+        columns, widths, _ = scan_journal(journal_file)
+    last_line_by_key = _last_lines_by_key(journal_file)
+    if not columns:
+        logger.warning("Нет данных для записи в Excel")
+        return
+
+    logger.info(f"Сборка {filename} из журнала {journal_file}")
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Products")
+    for col_idx, column in enumerate(columns, start=1):
+        worksheet.column_dimensions[get_column_letter(col_idx)].width = widths[column] + 2
+
+    header = []
+    for column in columns:
+        cell = WriteOnlyCell(worksheet, value=column)
+        cell.font = Font(bold=True)
+        cell.alignment = Alignment(horizontal="center")
+        header.append(cell)
+    worksheet.append(header)
+
+    def price_cell(value):
+        # В журнале цены в копейках, в Excel — числом в рублях
+        if not isinstance(value, int) or isinstance(value, bool):
+            return value
+        cell = WriteOnlyCell(worksheet, value=value / 100)
+        cell.number_format = PRICE_FORMAT
+        return cell
+
+    price_columns = frozenset(PRICE_COLUMNS)
+    with open(journal_file, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            if line.strip():
+                row = json.loads(line)
+                key = row.get(KEY_COLUMN)
+                if key is not None and last_line_by_key.get(str(key)) != line_no:
+                    continue
+                worksheet.append(
+                    [
+                        price_cell(row.get(column)) if column in price_columns else row.get(column)
+                        for column in columns
+                    ]
+                )
+
+    try:
+        workbook.save(filename)
+        logger.info(f"Excel-файл {filename} успешно собран")
+    except Exception as e:
+        logger.error(f"Ошибка при записи в Excel-файл {filename}: {e}")
+        raise
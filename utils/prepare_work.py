@@ -1,46 +1,121 @@
-import asyncio
-from playwright.async_api import async_playwright
+import time
+from typing import Optional
+from urllib.parse import quote
+from playwright.async_api import BrowserContext, Page, async_playwright
 from utils.logger import setup_logger
+from utils.waits import wait_for_any
 
 logger = setup_logger()
 
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
+VIEWPORT = {"width": 1280, "height": 720}
+# Аргументы запуска для серверов без графики: без /dev/shm, первого запуска и фоновых сервисов
+LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-dev-shm-usage",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-background-networking",
+    "--disable-extensions",
+]
+# Куки, наличие которых означает, что антибот-проверка уже пройдена
+SESSION_COOKIES = ("__Secure-access-token", "__Secure-refresh-token", "abt_data")
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', { get: () => false });
+    window.navigator.chrome = { runtime: {} };
+    Object.defineProperty(navigator, 'languages', { get: () => ['en-US', 'en'] });
+    Object.defineProperty(navigator, 'plugins', { get: () => [1, 2, 3, 4, 5] });
+    """
 
-async def preparation_before_work(item_name: str):
-    """Асинхронная функция подготовки к парсингу с Playwright."""
-    logger.info("Запуск Playwright и настройка браузера")
-    playwright = await async_playwright().start()
-    browser = await playwright.chromium.launch(headless=False)
-    context = await browser.new_context(
-        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36",
-        viewport={"width": 1280, "height": 720},
-    )
-
-    await context.add_init_script(
-        """
-        Object.defineProperty(navigator, 'webdriver', { get: () => false });
-        window.navigator.chrome = { runtime: {} };
-        Object.defineProperty(navigator, 'languages', { get: () => ['en-US', 'en'] });
-        Object.defineProperty(navigator, 'plugins', { get: () => [1, 2, 3, 4, 5] });
-        """
-    )
-
-    page = await context.new_page()
+
+def search_url(item_name: str) -> str:
+    """Возвращает адрес страницы результатов поиска Ozon."""
+    return f"https://www.ozon.ru/search/?text={quote(item_name)}&from_global=true"
+
+
+async def has_valid_session(context: BrowserContext) -> bool:
+    """Проверяет, есть ли в контексте неистёкшие сессионные куки Ozon."""
+    now = time.time()
+    for cookie in await context.cookies("https://www.ozon.ru"):
+        if cookie["name"] in SESSION_COOKIES and (
+            cookie.get("expires", -1) == -1 or cookie["expires"] > now
+        ):
+            return True
+    return False
+
+
+async def open_search_results(page: Page, item_name: str) -> bool:
+    """Открывает результаты поиска напрямую по адресу, без ввода запроса."""
+    try:
+        await page.goto(search_url(item_name), wait_until="domcontentloaded", timeout=30000)
+        await page.wait_for_selector("a[href*='/product/']", timeout=15000, state="attached")
+        logger.info(f"Открыты результаты поиска: {item_name}")
+        return True
+    except Exception as e:
+        logger.warning(f"Не удалось открыть результаты поиска напрямую: {e}")
+        return False
+
+
+async def _warm_up_and_search(page: Page, item_name: str) -> None:
+    """Заходит на главную страницу и вводит запрос в строку поиска, как пользователь."""
     logger.info("Переход на сайт Ozon")
-    await page.goto("https://ozon.ru", wait_until="networkidle")
+    await page.goto("https://ozon.ru", wait_until="domcontentloaded")
 
+    # Ждём строку поиска, а не простоя сети: счётчики на главной не дают ему наступить
     logger.info("Ожидание загрузки страницы")
-    await asyncio.sleep(5)
-
+    if not await wait_for_any(page, ['input[name="text"]'], timeout=30000, name="строка поиска"):
+        raise TimeoutError("Строка поиска Ozon не появилась")
     await page.evaluate("window.scrollBy(0, 500)")
-    await asyncio.sleep(2)
 
     logger.info(f"Ввод поискового запроса: {item_name}")
     search_input = await page.wait_for_selector('input[name="text"]', timeout=30000)
     await search_input.type(item_name, delay=100)
-    await asyncio.sleep(0.5)
 
     search_button = await page.wait_for_selector('button[type="submit"]', timeout=10000)
     await search_button.click()
-    await page.wait_for_load_state("networkidle")
+    # Поиск может увести и на /search/, и на /category/, но в адресе всегда есть text=
+    await page.wait_for_url(lambda url: "text=" in url, wait_until="domcontentloaded", timeout=30000)
+    await wait_for_any(page, ["a[href*='/product/']"], timeout=30000, name="результаты поиска")
     logger.info("Поисковый запрос отправлен")
-    return page, browser
\ No newline at end of file
+
+
+async def go_to_search(page: Page, item_name: str) -> None:
+    """Переходит к результатам нового запроса в уже открытом браузере."""
+    if not await open_search_results(page, item_name):
+        await _warm_up_and_search(page, item_name)
+
+
+async def preparation_before_work(
+    item_name: str, headless: bool = False, profile_dir: Optional[str] = None
+):
+    """Асинхронная функция подготовки к парсингу с Playwright.
+
+    С profile_dir используется постоянный контекст: куки сохраняются между запусками,
+    и при живой сессии прогрев на главной странице пропускается. Возвращает страницу
+    и объект, у которого нужно вызвать close() по завершении (браузер или контекст).
+    """
+    logger.info(f"Запуск Playwright и настройка браузера (headless: {headless}, профиль: {profile_dir})")
+    playwright = await async_playwright().start()
+    if profile_dir:
+        context = await playwright.chromium.launch_persistent_context(
+            profile_dir,
+            headless=headless,
+            args=LAUNCH_ARGS,
+            user_agent=USER_AGENT,
+            viewport=VIEWPORT,
+        )
+        closable = context
+    else:
+        browser = await playwright.chromium.launch(headless=headless, args=LAUNCH_ARGS)
+        context = await browser.new_context(user_agent=USER_AGENT, viewport=VIEWPORT)
+        closable = browser
+
+    await context.add_init_script(STEALTH_SCRIPT)
+
+    page = context.pages[0] if context.pages else await context.new_page()
+    if await has_valid_session(context):
+        logger.info("Найдена сохранённая сессия, прогрев главной страницы пропущен")
+        if await open_search_results(page, item_name):
+            return page, closable
+    await _warm_up_and_search(page, item_name)
+    return page, closable
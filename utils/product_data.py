@@ -1,176 +1,115 @@
 import asyncio
-import pandas as pd
-from typing import Optional, Tuple
-from bs4 import BeautifulSoup, Tag
+import os
+import time
+from concurrent.futures import Executor
+from functools import partial
+from typing import Any, Optional, Tuple
 from playwright.async_api import Page
-from openpyxl.styles import Alignment, Font
-from openpyxl.utils import get_column_letter
 from utils.logger import setup_logger
-import gc
-import os
+from utils.archive import PageArchive
+from utils.blocking import ResourceBlocker
+from utils.checkpoint import CheckpointStore
+from utils.errors import (
+    ANTIBOT_URL_MARKERS,
+    CaptchaError,
+    ParseError,
+    ProductFetchError,
+    ProductNotFoundError,
+    TIMEOUT,
+    classify_error,
+)
+from utils.extraction import (
+    create_parse_executor,
+    extract_product_timed,
+    needs_dom_fallback,
+    parse_seller_modal,
+    run_parser,
+)
+from utils.fixtures import FixtureRecorder
+from utils.history import PriceHistory
+from utils.http_fetch import HttpFetcher
+from utils.memory import MemoryMonitor
+from utils.metrics import ProductTimer, ProgressLog, RunMetrics
+from utils.records import ProductRecord
+from utils.seller_cache import SellerCache
+from utils.storage import open_store, output_path_for
+from utils.urls import product_id_from_url
+from utils.waits import backoff_delay, wait_for_any, wait_stats
+from utils.widget_state import (
+    PRODUCT_READY_SELECTORS,
+    fetch_all_widget_states,
+    fetch_widget_states,
+)
+from utils.work_queue import LEASED, PENDING, Lease, WorkQueue
 
 logger = setup_logger()
 
+SELLER_WIDGET = "div[data-widget='webCurrentSeller']"
+OUT_OF_STOCK_SELECTOR = "div[data-widget='webOutOfStock']"
+# Заголовки страницы антибот-проверки вместо страницы товара
+ANTIBOT_TITLES = ("Доступ ограничен", "Antibot", "Access denied")
+# Пауза воркера, когда свободных задач в общей очереди нет, но другие узлы ещё работают
+QUEUE_POLL_INTERVAL = 5.0
 
-async def _get_stars_reviews(
-    soup: BeautifulSoup,
-) -> Tuple[Optional[str], Optional[str]]:
-    """Извлекает рейтинг и количество отзывов продавца."""
-    try:
-        product_statistic = soup.select_one("div[data-widget='webSingleProductScore']")
-        if product_statistic and " • " in product_statistic.text:
-            stars, reviews = product_statistic.text.strip().split(" • ")
-            return stars.strip(), reviews.strip()
-        return None, None
-    except Exception:
-        return None, None
-    finally:
-        product_statistic = None
-
-
-async def _get_sale_price(soup: BeautifulSoup) -> Optional[str]:
-    """Извлекает цену с Ozon Картой."""
-    try:
-        price_element = soup.find(
-            "span", string=lambda text: text and "Ozon Карт" in text
-        )
-        if price_element and price_element.parent:
-            price_span = price_element.parent.select_one("div > span")
-            if price_span:
-                return (
-                    price_span.text.strip()
-                    .replace("\u2009", "")
-                    .replace("₽", "")
-                    .strip()
-                )
-        return None
-    except Exception:
-        return None
-    finally:
-        price_element = price_span = None
-
-
-async def _get_full_prices(soup: BeautifulSoup) -> Tuple[Optional[str], Optional[str]]:
-    """Извлекает цену до скидок и без Ozon Карты."""
-    try:
-        # Основной вариант через "без Ozon Карты"
-        price_element = soup.find(
-            "span", string=lambda text: text and "без Ozon Карты" in text
-        )
-        if price_element and price_element.parent and price_element.parent.parent:
-            price_spans = price_element.parent.parent.select("div > span")
-            if price_spans:
-                discount_price = (
-                    price_spans[0]
-                    .text.strip()
-                    .replace("\u2009", "")
-                    .replace("₽", "")
-                    .strip()
-                )
-                base_price = (
-                    price_spans[1]
-                    .text.strip()
-                    .replace("\u2009", "")
-                    .replace("₽", "")
-                    .strip()
-                    if len(price_spans) > 1
-                    else None
-                )
-                return discount_price, base_price
-
-        # Обходной вариант через data-widget="webPrice"
-        web_price_widget = soup.find("div", {"data-widget": "webPrice"})
-        if web_price_widget:
-            price_spans = web_price_widget.select("div.pm3_27 span")
-            if price_spans:
-                discount_price = (
-                    price_spans[0]
-                    .text.strip()
-                    .replace("\u2009", "")
-                    .replace("₽", "")
-                    .strip()
-                )
-                base_price = (
-                    price_spans[1]
-                    .text.strip()
-                    .replace("\u2009", "")
-                    .replace("₽", "")
-                    .strip()
-                    if len(price_spans) > 1
-                    else None
-                )
-                return discount_price, base_price
 
-        return None, None
-    except Exception:
-        return None, None
-    finally:
-        price_element = price_spans = web_price_widget = None
-
-
-async def _get_product_name(soup: BeautifulSoup) -> str:
-    """Извлекает название товара."""
+async def _get_product_id(page: Page) -> Optional[str]:
+    """Извлекает артикул товара; к этому моменту страница уже загружена, поэтому без ожидания."""
     try:
-        heading_div = soup.select_one("div[data-widget='webProductHeading']")
-        if isinstance(heading_div, Tag):
-            title_element = heading_div.find("h1")
-            if isinstance(title_element, Tag):
-                return title_element.text.strip().replace("\t", "").replace("\n", " ")
-        return ""
+        element = await page.query_selector('//div[contains(text(), "Артикул: ")]')
+        if element:
+            text = await element.inner_text()
+            return text.split("Артикул: ")[1].strip()
     except Exception as e:
-        logger.warning(f"Ошибка при извлечении названия товара: {e}")
-        return ""
+        logger.warning(f"Ошибка при извлечении артикула: {e}")
+    # Артикул Ozon совпадает с числовым id в адресе товара
+    return product_id_from_url(page.url)
 
 
-async def _get_salesman_name(soup: BeautifulSoup) -> Optional[str]:
-    """Извлекает имя продавца."""
-    try:
-        for element in soup.select("a[href*='/seller/']"):
-            href = element.get("href", "").lower()
-            text = element.text.strip()
-            if "reviews" not in href and "info" not in href and len(text) >= 2:
-                return text
-        return None
-    except Exception as e:
-        logger.warning(f"Ошибка при извлечении имени продавца: {e}")
-        return None
+def _check_response(page: Page, response) -> None:
+    """Распознаёт удалённый товар и антибот-проверку сразу после перехода."""
+    status = response.status if response else None
+    if status == 404:
+        raise ProductNotFoundError("Товар не найден (404)")
+    if status in (403, 429) or any(marker in page.url for marker in ANTIBOT_URL_MARKERS):
+        raise CaptchaError(f"Антибот-проверка (HTTP {status}, {page.url})")
 
 
-async def _get_product_id(page: Page) -> Optional[str]:
-    """Извлекает артикул товара."""
+async def _diagnose_missing_widgets(page: Page) -> ProductFetchError:
+    """Определяет, почему не появились виджеты товара."""
     try:
-        element = await page.wait_for_selector(
-            '//div[contains(text(), "Артикул: ")]', timeout=5000, state="attached"
-        )
-        text = await element.inner_text()
-        return text.split("Артикул: ")[1].strip()
+        title = await page.title()
+        if any(marker in title for marker in ANTIBOT_TITLES):
+            return CaptchaError(f"Антибот-проверка: {title}")
+        if await page.query_selector(OUT_OF_STOCK_SELECTOR):
+            return ProductNotFoundError("Товар закончился")
     except Exception as e:
-        logger.warning(f"Ошибка при извлечении артикула: {e}")
-        return None
+        logger.debug(f"Ошибка при разборе причины отсутствия виджетов: {e}")
+    return ProductFetchError("Виджеты товара не появились за 5 с", TIMEOUT)
 
 
-async def _get_product_brand(soup: BeautifulSoup) -> Optional[str]:
-    """Извлекает бренд товара."""
+async def _page_snapshot(page: Page) -> tuple[dict[str, str], Optional[str]]:
+    """Состояния всех виджетов и полный HTML страницы для архива."""
+    raw_states = await fetch_all_widget_states(page)
     try:
-        breadcrumbs = soup.select_one("div[data-widget='breadCrumbs']")
-        if breadcrumbs:
-            last_item = breadcrumbs.select_one("li:last-child")
-            if last_item:
-                brand_tag = last_item.find("span")
-                if brand_tag:
-                    return brand_tag.get_text(strip=True)
-        return None
+        html = await page.content()
     except Exception as e:
-        logger.warning(f"Ошибка при извлечении бренда: {e}")
-        return None
+        logger.warning(f"Ошибка при получении HTML страницы для архива: {e}")
+        html = None
+    return raw_states, html
 
 
-async def get_ozon_seller_info(page: Page) -> Tuple[Optional[str], Optional[str]]:
-    """Извлекает информацию о продавце и ИНН из модального окна на странице товара."""
+async def get_ozon_seller_info(
+    page: Page, executor: Optional[Executor] = None, capture: Optional[dict] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """Извлекает информацию о продавце и ИНН из модального окна на странице товара.
+
+    Если передан словарь capture, HTML модального окна сохраняется в нём под ключом
+    "seller_html" (для записи фикстур).
+    """
     try:
-        seller_block = await page.wait_for_selector(
-            "div[data-widget='webCurrentSeller']", timeout=5000, state="attached"
-        )
+        if not await wait_for_any(page, [SELLER_WIDGET], timeout=2000, name="виджет продавца"):
+            return None, None
+        seller_block = await page.query_selector(SELLER_WIDGET)
         button = await seller_block.query_selector(
             "button:has(svg path[d='M8 0c4.964 0 8 3.036 8 8s-3.036 8-8 8-8-3.036-8-8 3.036-8 8-8m-.889 11.556a.889.889 0 0 0 1.778 0V8A.889.889 0 0 0 7.11 8zM8.89 4.444a.889.889 0 1 0-1.778 0 .889.889 0 0 0 1.778 0'])"
         )
@@ -180,112 +119,277 @@ async def get_ozon_seller_info(page: Page) -> Tuple[Optional[str], Optional[str]
             await button.click()
         except Exception:
             await page.evaluate("button => button.click()", button)
-        await asyncio.sleep(0.3)  # Минимальная задержка для модального окна
 
         modal = await page.wait_for_selector(
             "div[data-popper-placement^='top']", timeout=5000, state="visible"
         )
         if not modal:
             return None, None
-        soup = BeautifulSoup(await page.content(), "lxml")
-        modal_div = soup.select_one("div[data-popper-placement^='top']")
-        if not modal_div:
-            return None, None
-
-        paragraphs = modal_div.find_all("p")
-        seller_details = ''
-        for i in range(len(paragraphs) - 2):
-            seller_details1 = paragraphs[i].get_text(strip=True) if paragraphs else None
-            seller_details += seller_details1
-        inn = paragraphs[-2].get_text(strip=True) if paragraphs else None
-        return seller_details, inn
+        # Разбираем только модальное окно, а не всю страницу
+        modal_html = await modal.evaluate("el => el.outerHTML")
+        if capture is not None:
+            capture["seller_html"] = modal_html
+        return await run_parser(executor, parse_seller_modal, modal_html)
     except Exception:
         return None, None
-    finally:
-        if "soup" in locals():
-            soup.decompose()
-        seller_block = button = modal = modal_div = paragraphs = None
-        gc.collect()
 
 
 async def collect_product_info(
-    page: Page, url: str, max_retries: int = 3
-) -> dict[str, Optional[str]]:
-    """Собирает информацию о товаре с сайта Ozon с повторными попытками."""
+    page: Page,
+    url: str,
+    max_retries: int = 1,
+    blocker: Optional[ResourceBlocker] = None,
+    executor: Optional[Executor] = None,
+    seller_cache: Optional[SellerCache] = None,
+    timer: Optional[ProductTimer] = None,
+    recorder: Optional[FixtureRecorder] = None,
+    archive: Optional[PageArchive] = None,
+    extra_fields: Optional[dict[str, Any]] = None,
+) -> ProductRecord:
+    """Собирает информацию о товаре с сайта Ozon с повторными попытками.
+
+    Если все попытки неудачны, выбрасывает ProductFetchError с видом ошибки
+    (таймаут, антибот, товар не найден, ошибка разбора); удалённый товар
+    повторно не запрашивается. С recorder HTML страницы и модального окна
+    продавца сохраняются как фикстура. В archive сохраняются состояния всех
+    виджетов, полный HTML страницы и окно продавца вместе с extra_fields для
+    повторного извлечения: отбор нужных виджетов делают извлекатели при повторе.
+    Неудачная попытка, в которой страница товара загрузилась, тоже сохраняется
+    в archive с видом ошибки, чтобы её можно было повторить после исправления разбора.
+    """
+    timer = timer or ProductTimer(url)
     for attempt in range(max_retries):
+        timer.attempts = attempt + 1
+        loaded = False
+        snapshot = None
         try:
-            logger.info(f"Попытка {attempt + 1}/{max_retries} обработки {url}")
-            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-            await asyncio.sleep(0.2)
-            await page.wait_for_selector(
-                "div[data-widget='webProductHeading']", timeout=5000, state="attached"
+            logger.debug(f"Попытка {attempt + 1}/{max_retries} обработки {url}")
+            with timer.stage("navigation"):
+                response = await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+            _check_response(page, response)
+            loaded = True
+            with timer.stage("widget_wait"):
+                ready = await wait_for_any(
+                    page, PRODUCT_READY_SELECTORS, timeout=5000, name="виджеты товара"
+                )
+            if not ready:
+                raise await _diagnose_missing_widgets(page)
+            with timer.stage("widget_state_fetch"):
+                raw_states = await fetch_widget_states(page)
+            if archive:
+                with timer.stage("archive"):
+                    snapshot = await _page_snapshot(page)
+            fields, timings = await run_parser(executor, extract_product_timed, raw_states)
+            html = None
+            # Полный HTML нужен только для полей, которых нет в состояниях виджетов
+            if needs_dom_fallback(fields):
+                logger.debug("Не все поля найдены в состояниях виджетов, разбор DOM")
+                with timer.stage("page_content"):
+                    html = (snapshot and snapshot[1]) or await page.content()
+                fields, timings = await run_parser(
+                    executor, extract_product_timed, raw_states, html
+                )
+            for name, seconds in timings.items():
+                timer.add(name, seconds)
+            if not fields["Название товара"] and not fields["Цена со скидкой"] and not fields["Цена"]:
+                raise ParseError("Не удалось извлечь ни название, ни цену товара")
+
+            if fields["Ссылка на продавца"] is None:
+                try:
+                    seller_link_selector = f"{SELLER_WIDGET} a[href]"
+                    if await wait_for_any(
+                        page, [seller_link_selector], timeout=2000, name="ссылка на продавца"
+                    ):
+                        seller_link = await page.query_selector(seller_link_selector)
+                        fields["Ссылка на продавца"] = (
+                            await seller_link.get_attribute("href") if seller_link else None
+                        )
+                except Exception as e:
+                    logger.warning(f"Ошибка при получении ссылки на продавца: {e}")
+
+            if fields["Артикул"] is None:
+                fields["Артикул"] = await _get_product_id(page)
+            cached_seller = (
+                seller_cache.get(fields["Ссылка на продавца"]) if seller_cache else None
             )
-            soup = BeautifulSoup(await page.content(), "lxml")
-
-            seller_href = None
-            try:
-                seller_block = await page.wait_for_selector(
-                    "div[data-widget='webCurrentSeller']",
-                    timeout=5000,
-                    state="attached",
+            capture = {} if recorder or archive else None
+            if cached_seller:
+                seller_details, inn = cached_seller
+            else:
+                with timer.stage("seller_modal"):
+                    seller_details, inn = await get_ozon_seller_info(
+                        page, executor=executor, capture=capture
+                    )
+                if seller_cache:
+                    seller_cache.put(fields["Ссылка на продавца"], seller_details, inn)
+
+            logger.debug(f"Успешно собраны данные для {url}")
+            if blocker:
+                blocked, saved = blocker.pop_page_stats(page)
+                logger.debug(
+                    f"Заблокировано запросов: {blocked}, сэкономлено ≈{saved / 1024:.0f} КБ"
                 )
-                seller_link = await seller_block.query_selector("a[href]")
-                seller_href = (
-                    await seller_link.get_attribute("href") if seller_link else None
+            record = ProductRecord.from_fields(fields, url, seller_details, inn)
+            if archive:
+                with timer.stage("archive"):
+                    archive.record(
+                        record.product_id,
+                        url,
+                        snapshot[0],
+                        html=snapshot[1],
+                        seller_html=capture.get("seller_html"),
+                        seller_href=record.seller_url,
+                        seller_details=seller_details,
+                        inn=inn,
+                        extra=extra_fields,
+                    )
+            if recorder:
+                if html is None:
+                    html = (snapshot and snapshot[1]) or await page.content()
+                recorder.save(
+                    fields["Артикул"] or product_id_from_url(url) or "unknown",
+                    html,
+                    raw_states,
+                    capture.get("seller_html"),
+                    record.as_row(),
                 )
-            except Exception as e:
-                logger.warning(f"Ошибка при получении ссылки на продавца: {e}")
-
-            product_id = await _get_product_id(page)
-            product_name = await _get_product_name(soup)
-            product_stars, product_reviews = await _get_stars_reviews(soup)
-            product_ozon_card_price = await _get_sale_price(soup)
-            product_discount_price, product_base_price = await _get_full_prices(soup)
-            salesman = await _get_salesman_name(soup)
-            product_brand = await _get_product_brand(soup)
-            seller_details, inn = await get_ozon_seller_info(page)
-
-            logger.info(f"Успешно собраны данные для {url}")
-            return {
-                "Артикул": product_id,
-                "Название товара": product_name,
-                "Бренд": product_brand,
-                "Цена с картой озона": product_ozon_card_price,
-                "Цена со скидкой": product_discount_price,
-                "Цена": product_base_price,
-                "Рейтинг": product_stars,
-                "Отзывы": product_reviews,
-                "Продавец": salesman,
-                "Ссылка на продавца": seller_href,
-                "Данные о продавце": seller_details,
-                "ИНН": inn,
-                "Ссылка на товар": url,
-            }
+            return record
         except Exception as e:
-            logger.warning(f"Ошибка при обработке {url} (попытка {attempt + 1}): {e}")
-            if attempt < max_retries - 1:
-                await asyncio.sleep(5)
-            else:
-                logger.error(f"Не удалось обработать {url} после {max_retries} попыток")
-                return {
-                    "Артикул": None,
-                    "Название товара": None,
-                    "Бренд": None,
-                    "Цена с картой озона": None,
-                    "Цена со скидкой": None,
-                    "Цена": None,
-                    "Рейтинг": None,
-                    "Отзывы": None,
-                    "Продавец": None,
-                    "Ссылка на продавца": None,
-                    "Данные о продавце": None,
-                    "ИНН": None,
-                    "Ссылка на товар": url,
-                }
-        finally:
-            if "soup" in locals():
-                soup.decompose()
-            gc.collect()
+            error = classify_error(e)
+            logger.warning(
+                f"Ошибка при обработке {url} (попытка {attempt + 1}, {error.kind}): {error}"
+            )
+            # Виджеты могли не найтись из-за изменения разметки: такая страница нужна в архиве
+            if archive and loaded:
+                with timer.stage("archive"):
+                    if snapshot is None:
+                        snapshot = await _page_snapshot(page)
+                    archive.record(
+                        product_id_from_url(url),
+                        url,
+                        snapshot[0],
+                        html=snapshot[1],
+                        error=error.kind,
+                        extra=extra_fields,
+                    )
+            if not error.retryable or attempt == max_retries - 1:
+                timer.status = error.kind
+                if error is e:
+                    raise
+                raise error from e
+            await asyncio.sleep(backoff_delay(attempt))
+
+
+async def collect_product_info_http(
+    fetcher: HttpFetcher,
+    page: Page,
+    url: str,
+    max_retries: int = 1,
+    blocker: Optional[ResourceBlocker] = None,
+    executor: Optional[Executor] = None,
+    seller_cache: Optional[SellerCache] = None,
+    timer: Optional[ProductTimer] = None,
+    recorder: Optional[FixtureRecorder] = None,
+    archive: Optional[PageArchive] = None,
+    extra_fields: Optional[dict[str, Any]] = None,
+) -> ProductRecord:
+    """Собирает товар из JSON страницы без перехода в браузере.
+
+    Данные о продавце и ИНН есть только в модальном окне, поэтому товар, продавца
+    которого нет в кэше, обрабатывается в браузере через collect_product_info;
+    последующие товары этого продавца берут данные из кэша. В archive
+    сохраняются состояния всех виджетов ответа: HTML в этом режиме не загружается.
+    Неудачные попытки, в которых ответ получен, сохраняются с видом ошибки.
+    """
+    timer = timer or ProductTimer(url)
+    for attempt in range(max_retries):
+        timer.attempts = attempt + 1
+        capture = {} if archive else None
+        try:
+            with timer.stage("http_fetch"):
+                raw_states = await fetcher.fetch_states(url, capture=capture)
+            fields, timings = await run_parser(executor, extract_product_timed, raw_states)
+            for name, seconds in timings.items():
+                timer.add(name, seconds)
+            if not fields["Название товара"] and not fields["Цена со скидкой"] and not fields["Цена"]:
+                raise ParseError("Не удалось извлечь ни название, ни цену товара")
+            cached_seller = (
+                seller_cache.get(fields["Ссылка на продавца"]) if seller_cache else None
+            )
+            if cached_seller is None:
+                break
+            if fields["Артикул"] is None:
+                fields["Артикул"] = product_id_from_url(url)
+            seller_details, inn = cached_seller
+            logger.debug(f"Успешно собраны данные для {url} (http)")
+            record = ProductRecord.from_fields(fields, url, seller_details, inn)
+            if archive:
+                with timer.stage("archive"):
+                    archive.record(
+                        record.product_id,
+                        url,
+                        capture.get("widget_states", {}),
+                        seller_href=record.seller_url,
+                        seller_details=seller_details,
+                        inn=inn,
+                        extra=extra_fields,
+                    )
+            return record
+        except Exception as e:
+            error = classify_error(e)
+            logger.warning(
+                f"Ошибка при обработке {url} (http, попытка {attempt + 1}, {error.kind}): {error}"
+            )
+            if archive and capture.get("widget_states"):
+                with timer.stage("archive"):
+                    archive.record(
+                        product_id_from_url(url),
+                        url,
+                        capture["widget_states"],
+                        error=error.kind,
+                        extra=extra_fields,
+                    )
+            if not error.retryable or attempt == max_retries - 1:
+                timer.status = error.kind
+                if error is e:
+                    raise
+                raise error from e
+            await asyncio.sleep(backoff_delay(attempt))
+
+    logger.debug(f"Продавца товара {url} нет в кэше, обработка в браузере")
+    async with fetcher.browser_lock:
+        return await collect_product_info(
+            page=page,
+            url=url,
+            max_retries=max_retries,
+            blocker=blocker,
+            executor=executor,
+            seller_cache=seller_cache,
+            timer=timer,
+            recorder=recorder,
+            archive=archive,
+            extra_fields=extra_fields,
+        )
+
+
+class RateLimiter:
+    """Глобальный ограничитель частоты запросов, общий для всех воркеров."""
+
+    def __init__(self, rate: float = 0.0):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        """Ожидает свободный слот перед очередным переходом на страницу."""
+        if not self.interval:
+            return
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
 
 
 async def collect_data(
@@ -293,86 +397,311 @@ async def collect_data(
     page: Page,
     progress_handler=None,
     output_file: str = "ozon_products.xlsx",
-    processed_file: str = "processed_links.txt",
+    concurrency: int = 1,
+    rate_limit: float = 0.0,
+    output_format: str = "xlsx",
+    blocker: Optional[ResourceBlocker] = None,
+    parse_workers: Optional[int] = None,
+    seller_cache: Optional[SellerCache] = None,
+    store=None,
+    extra_fields: Optional[dict[str, str]] = None,
+    metrics: Optional[RunMetrics] = None,
+    recorder: Optional[FixtureRecorder] = None,
+    memory: Optional[MemoryMonitor] = None,
+    checkpoint: Optional[CheckpointStore] = None,
+    query: str = "",
+    stop_event: Optional[asyncio.Event] = None,
+    max_retries: int = 1,
+    retry_rounds: int = 2,
+    retry_concurrency: int = 1,
+    retry_backoff: float = 30.0,
+    history: Optional[PriceHistory] = None,
+    fetcher: Optional[HttpFetcher] = None,
+    progress_log: Optional[ProgressLog] = None,
+    work_queue: Optional[WorkQueue] = None,
+    worker_name: str = "",
+    lease_timeout: float = 300.0,
+    archive: Optional[PageArchive] = None,
 ) -> None:
-    """Асинхронная функция сбора данных с использованием Playwright."""
-    products_data = {}
+    """Асинхронная функция сбора данных пулом страниц с общей очередью ссылок.
+
+    Если передано хранилище store, оно не закрывается по завершении: им владеет
+    вызывающий код. extra_fields добавляются к каждой строке результата.
+    То же относится к metrics и memory: без них сводки по этапам и по памяти
+    выводятся в конце сбора.
+
+    В checkpoint для товаров запроса query фиксируются состояние, число попыток и
+    строка результата. После установки stop_event воркеры не берут новые товары:
+    начатые дообрабатываются, накопленные строки записываются.
+
+    Основной проход делает max_retries попыток на товар без долгих пауз; неудачные
+    товары попадают в очередь повторов и обрабатываются после него в retry_rounds
+    отложенных проходов с retry_concurrency страницами и паузой retry_backoff·2^n с.
+    Неудачные товары в результаты не записываются. Успешные строки, если передана
+    history, сохраняются в историю цен.
+
+    С fetcher товары запрашиваются по HTTP: воркеров столько, сколько соединений
+    у fetcher, а браузерная страница одна и нужна только для продавцов не из кэша.
+    Через progress_log вызывающий код может сам вести учёт прогресса.
+
+    С work_queue товары запроса берутся в аренду из общей очереди (products_urls
+    не используется): успешные подтверждаются вместе со строкой, неудачные
+    возвращаются в очередь с паузой retry_backoff·2^n с и после исчерпания попыток
+    переходят в мёртвые. Сбор заканчивается, когда у запроса в очереди не осталось
+    ожидающих и арендованных задач, в том числе у других узлов.
+
+    В archive сохраняются исходные данные каждого успешно собранного товара,
+    чтобы повторить извлечение командой reextract.py без обращения к сайту.
+    """
+    products_data: dict[str, dict] = {}
+    failures: dict[str, tuple[str, ProductFetchError]] = {}
+    if work_queue is not None:
+        counts = work_queue.counts(query)
+        total = counts.get(PENDING, 0) + counts.get(LEASED, 0)
+    else:
+        total = len(products_urls)
     if progress_handler:
-        progress_handler.set_total(len(products_urls))
-    processed_count = 0
-
-    for url in products_urls.values():
-        processed_count += 1
-        logger.info(f"Обработка товара {processed_count}/{len(products_urls)}: {url}")
-        data = await collect_product_info(page=page, url=url)
-        product_id = data.get("Артикул", f"no_id_{processed_count}")
-        products_data[product_id] = data
-        # Сохраняем URL в файл обработанных ссылок
-        try:
-            with open(processed_file, "a", encoding="utf-8") as f:
-                f.write(f"{url}\n")
-            logger.debug(f"URL {url} добавлен в {processed_file}")
-        except Exception as e:
-            logger.warning(f"Ошибка при записи в {processed_file}: {e}")
-        if progress_handler:
-            progress_handler.update()
-
-        if processed_count % 10 == 0:
-            write_data_to_excel(products_data=products_data, filename=output_file)
-            products_data.clear()  # Очищаем словарь после записи
-            gc.collect()
-            logger.debug("Промежуточная запись в Excel и очистка памяти")
-
-    if products_data:
-        write_data_to_excel(products_data=products_data, filename=output_file)
+        progress_handler.set_total(total)
+    progress = progress_log or ProgressLog(total)
+    saved_count = 0
+
+    # В режиме общей очереди задачи выдаёт work_queue, локальная очередь не используется
+    queue: asyncio.Queue[tuple[str, str]] = asyncio.Queue()
+    if work_queue is None:
+        for product_id, url in products_urls.items():
+            queue.put_nowait((product_id, url))
+
+    limiter = RateLimiter(rate_limit)
+    pages = [page]
+    if fetcher:
+        concurrency = max(1, min(fetcher.concurrency, total))
+        worker_pages = [page] * concurrency
+    else:
+        concurrency = max(1, min(concurrency, total))
+        for _ in range(concurrency - 1):
+            pages.append(await page.context.new_page())
+        worker_pages = pages
+    logger.info(f"Запуск {concurrency} воркеров, ограничение частоты: {rate_limit or 'нет'}")
+
+    def stopped() -> bool:
+        return stop_event is not None and stop_event.is_set()
+
+    def flush() -> None:
+        store.write_rows(products_data.values())
+        # Строки, которые хранилище ещё держит в памяти, будут отмечены после его закрытия
+        if checkpoint and not store.buffered():
+            checkpoint.mark_exported((query, product_id) for product_id in products_data)
         products_data.clear()
-        gc.collect()
-        logger.info(f"Финальные данные сохранены в {output_file}")
-
 
-def write_data_to_excel(
-    products_data: dict[str, dict[str, str | None]], filename: str = "products.xlsx"
-) -> None:
-    """Записывает данные о продуктах в Excel-файл, добавляя к существующим данным."""
-    if not products_data:
-        logger.warning("Нет данных для записи в Excel")
-        return
+    def on_result(product_id: str, record: ProductRecord) -> dict:
+        # Результаты приходят в произвольном порядке, поэтому учёт ведётся по id товара,
+        # а не по позиции в списке
+        nonlocal saved_count
+        saved_count += 1
+        record.extra = extra_fields
+        row = record.as_row()
+        products_data[product_id] = row
+        if checkpoint:
+            checkpoint.mark_finished(query, product_id, row)
+        if history:
+            history.record(product_id, row)
+
+        if saved_count % 10 == 0:
+            flush_started = time.perf_counter()
+            flush()
+            metrics.record_stage("output_flush", time.perf_counter() - flush_started)
+            logger.debug("Промежуточная запись результатов")
+        # Сборка мусора запускается, только если память процесса выше порога
+        memory.check()
+        return row
+
+    async def process(
+        product_id: str,
+        url: str,
+        worker_page: Page,
+        first_pass: bool,
+        lease: Optional[Lease] = None,
+    ) -> None:
+        await limiter.wait()
+        if checkpoint:
+            checkpoint.mark_in_flight(query, product_id)
+        timer = metrics.start_product(url)
+        fetch = (
+            partial(collect_product_info_http, fetcher) if fetcher else collect_product_info
+        )
+        try:
+            record = await fetch(
+                page=worker_page,
+                url=url,
+                max_retries=max_retries,
+                blocker=blocker,
+                executor=executor,
+                seller_cache=seller_cache,
+                timer=timer,
+                recorder=recorder,
+                archive=archive,
+                extra_fields=extra_fields,
+            )
+        except ProductFetchError as e:
+            error = e
+            record = None
+        finally:
+            metrics.finish_product(timer)
+        if record is not None:
+            failures.pop(product_id, None)
+            row = on_result(product_id, record)
+            if lease is not None and not work_queue.ack(lease, row):
+                logger.warning(
+                    f"Аренда товара {url} истекла до подтверждения, его мог обработать другой узел"
+                )
+        elif lease is None:
+            failures[product_id] = (url, error)
+            if checkpoint:
+                checkpoint.mark_failed(query, product_id, error.kind)
+        else:
+            delay = min(retry_backoff * 2 ** (lease.attempts - 1), 600.0)
+            if work_queue.nack(lease, error.kind, retryable=error.retryable, delay=delay):
+                failures[product_id] = (url, error)
+        if first_pass:
+            # Прогресс учитывает каждый товар один раз, повторные проходы его не двигают
+            progress.update(ok=record is not None)
+            if progress_handler:
+                progress_handler.update()
+
+    async def worker(
+        worker_id: int, worker_page: Page, work: asyncio.Queue, first_pass: bool
+    ) -> None:
+        while True:
+            if stopped():
+                return
+            try:
+                product_id, url = work.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                logger.debug(f"Воркер {worker_id}: обработка товара {url}")
+                await process(product_id, url, worker_page, first_pass)
+            finally:
+                work.task_done()
+
+    async def queue_worker(worker_id: int, worker_page: Page) -> None:
+        while not stopped():
+            leases = work_queue.lease(
+                query, f"{worker_name}-{worker_id}", visibility=lease_timeout
+            )
+            if not leases:
+                if not work_queue.active(query):
+                    return
+                await asyncio.sleep(QUEUE_POLL_INTERVAL)
+                continue
+            lease = leases[0]
+            logger.debug(f"Воркер {worker_id}: обработка товара {lease.url} (попытка {lease.attempts})")
+            # Прогресс учитывает каждый товар один раз, повторы из очереди его не двигают
+            await process(
+                lease.product_id, lease.url, worker_page, lease.attempts == 1, lease=lease
+            )
 
-    logger.info(f"Запись данных в {filename}")
-    df_new = pd.DataFrame.from_dict(products_data, orient="index")
+    async def retry_failures() -> None:
+        """Отложенные проходы по очереди неудачных товаров."""
+        for retry_round in range(retry_rounds):
+            retryable = [
+                (product_id, url)
+                for product_id, (url, error) in failures.items()
+                if error.retryable
+            ]
+            if not retryable or stopped():
+                return
+            delay = min(retry_backoff * 2 ** retry_round, 600.0)
+            logger.info(
+                f"Повторный проход {retry_round + 1}/{retry_rounds}: "
+                f"{len(retryable)} товаров через {delay:.0f} с"
+            )
+            if stop_event is None:
+                await asyncio.sleep(delay)
+            else:
+                # Пауза прерывается сигналом остановки
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=delay)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+            retry_queue: asyncio.Queue[tuple[str, str]] = asyncio.Queue()
+            for item in retryable:
+                retry_queue.put_nowait(item)
+            retry_count = max(1, min(retry_concurrency, len(retryable)))
+            if fetcher:
+                retry_pages = [page] * retry_count
+            else:
+                # Отложенный проход может идти шире основного: недостающие страницы
+                # открываются здесь и закрываются вместе со страницами воркеров
+                for _ in range(retry_count - len(pages)):
+                    pages.append(await page.context.new_page())
+                retry_pages = pages[:retry_count]
+            await asyncio.gather(
+                *(
+                    worker(i + 1, worker_page, retry_queue, first_pass=False)
+                    for i, worker_page in enumerate(retry_pages)
+                )
+            )
 
+    if parse_workers is None:
+        parse_workers = min(concurrency, os.cpu_count() or 1)
+    executor = create_parse_executor(parse_workers)
+    owns_metrics = metrics is None
+    if owns_metrics:
+        metrics = RunMetrics()
+    owns_memory = memory is None
+    if owns_memory:
+        memory = MemoryMonitor()
+    owns_store = store is None
+    if owns_store:
+        store = open_store(output_format=output_format, output_file=output_file)
     try:
-        # Проверяем, существует ли файл
-        if os.path.exists(filename):
-            # Загружаем существующий файл
-            df_existing = pd.read_excel(filename, sheet_name="Products")
-            # Объединяем данные
-            df_combined = pd.concat([df_existing, df_new], ignore_index=True)
+        if work_queue is not None:
+            await asyncio.gather(
+                *(queue_worker(i + 1, worker_page) for i, worker_page in enumerate(worker_pages))
+            )
         else:
-            # Если файла нет, используем только новые данные
-            df_combined = df_new
-
-        # Записываем объединённые данные
-        with pd.ExcelWriter(filename, engine="openpyxl", mode="w") as writer:
-            df_combined.to_excel(writer, sheet_name="Products", index=False)
-            worksheet = writer.sheets["Products"]
-
-            # Устанавливаем ширину столбцов
-            for col_idx, column_cells in enumerate(worksheet.iter_cols(), start=1):
-                max_length = max(
-                    (len(str(cell.value)) for cell in column_cells if cell.value), default=0
-                )
-                worksheet.column_dimensions[get_column_letter(col_idx)].width = (
-                    max_length + 2
+            await asyncio.gather(
+                *(
+                    worker(i + 1, worker_page, queue, first_pass=True)
+                    for i, worker_page in enumerate(worker_pages)
                 )
-
-            # Форматируем заголовки
-            for cell in worksheet[1]:
-                cell.font = Font(bold=True)
-                cell.alignment = Alignment(horizontal="center")
-
-        logger.info(f"Excel-файл {filename} успешно обновлён")
-
-    except Exception as e:
-        logger.error(f"Ошибка при записи в Excel-файл {filename}: {e}")
-        raise
\ No newline at end of file
+            )
+            if failures:
+                await retry_failures()
+    finally:
+        for extra_page in pages[1:]:
+            try:
+                await extra_page.close()
+            except Exception as e:
+                logger.warning(f"Ошибка при закрытии страницы воркера: {e}")
+
+        if products_data:
+            flush()
+        if owns_store:
+            store.close()
+            if checkpoint:
+                checkpoint.mark_all_exported()
+            logger.info(
+                f"Финальные данные сохранены в {output_path_for(output_format, output_file)}"
+            )
+        if work_queue is None and not queue.empty():
+            logger.info(f"Сбор остановлен, необработанных товаров: {queue.qsize()}")
+        if failures:
+            kinds: dict[str, int] = {}
+            for url, error in failures.values():
+                kinds[error.kind] = kinds.get(error.kind, 0) + 1
+                logger.warning(f"Не удалось обработать {url} ({error.kind}): {error}")
+            logger.warning(f"Неудачных товаров: {len(failures)} {kinds}")
+        if executor:
+            executor.shutdown()
+        if blocker:
+            blocker.log_summary()
+        wait_stats.log_summary()
+        if recorder:
+            logger.info(f"Сохранено фикстур: {recorder.saved} в {recorder.directory}")
+        if owns_metrics:
+            metrics.close()
+        if owns_memory:
+            memory.log_summary()
@@ -0,0 +1,60 @@
+from typing import Any, Optional
+
+# Атрибут записи и соответствующий столбец результата, в порядке столбцов
+COLUMNS = (
+    ("product_id", "Артикул"),
+    ("name", "Название товара"),
+    ("brand", "Бренд"),
+    ("card_price", "Цена с картой озона"),
+    ("sale_price", "Цена со скидкой"),
+    ("price", "Цена"),
+    ("rating", "Рейтинг"),
+    ("reviews", "Отзывы"),
+    ("seller", "Продавец"),
+    ("seller_url", "Ссылка на продавца"),
+    ("seller_details", "Данные о продавце"),
+    ("inn", "ИНН"),
+    ("url", "Ссылка на товар"),
+)
+# Дополнительные столбцы, которые добавляет вызывающий код (extra): при пакетном запуске — запрос
+QUERY_COLUMN = "Запрос"
+EXTRA_COLUMNS = (QUERY_COLUMN,)
+
+
+class ProductRecord:
+    """Компактная запись о товаре: без __dict__, словарь строится только при записи.
+
+    Цены хранятся целыми копейками, рейтинг — float, отзывы — int (см. utils.normalize).
+
+    extra — общие для многих записей дополнительные столбцы (например, «Запрос»);
+    словарь не копируется в каждую запись.
+    """
+
+    __slots__ = (*(attr for attr, _ in COLUMNS), "extra")
+
+    def __init__(self, url: str, extra: Optional[dict[str, Any]] = None, **values: Any):
+        for attr, _ in COLUMNS:
+            setattr(self, attr, values.get(attr))
+        self.url = url
+        self.extra = extra
+
+    @classmethod
+    def from_fields(
+        cls,
+        fields: dict[str, Optional[str]],
+        url: str,
+        seller_details: Optional[str] = None,
+        inn: Optional[str] = None,
+    ) -> "ProductRecord":
+        """Создаёт запись из полей, извлечённых со страницы (ключи — названия столбцов)."""
+        record = cls(url, seller_details=seller_details, inn=inn)
+        for attr, column in COLUMNS:
+            if column in fields:
+                setattr(record, attr, fields[column])
+        return record
+
+    def as_row(self) -> dict[str, Any]:
+        row = {column: getattr(self, attr) for attr, column in COLUMNS}
+        if self.extra:
+            row.update(self.extra)
+        return row
@@ -1,10 +1,19 @@
 import asyncio
-import os
+import json
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote, urlsplit
 from playwright.async_api import Page
 from utils.logger import setup_logger
+from utils.link_journal import LinkJournal
+from utils.urls import OZON_ORIGIN, PAGE_API_URL
 
 logger = setup_logger()
 
+# Ссылки на товары в ответе лежат внутри JSON-строк widgetStates, поэтому ищем их по тексту
+_API_PRODUCT_LINK_RE = re.compile(r"/product/(?:[^/\\\"?\s]*-)?(\d+)/")
+_API_NEXT_PAGE_RE = re.compile(r'"nextPage"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
 
 def load_links_from_file(file_path: str) -> list[str]:
     """Загружает ссылки из файла."""
@@ -29,80 +38,123 @@ async def page_down(
     temp_file: str = "temp_links.txt",
 ) -> list[str]:
     """Асинхронная функция для плавной прокрутки страницы и сбора ссылок."""
-    collected_links = set()
+    journal = LinkJournal(temp_file)
+    if colvo > 0 and len(journal) >= colvo:
+        logger.info(f"Достигнуто целевое количество ссылок: {colvo}")
+        journal.close()
+        return journal.links(colvo)
+
     attempts = 0
     current_position = 0
     # Ожидаем загрузки страницы перед началом
     await page.wait_for_load_state("domcontentloaded")
     last_height = await page.evaluate("() => document.body.scrollHeight")
 
-    if os.path.exists(temp_file):
-        try:
-            with open(temp_file, "r", encoding="utf-8") as f:
-                collected_links.update(line.strip() for line in f if line.strip())
-            logger.info(f"Загружено {len(collected_links)} ссылок из {temp_file}")
-            if colvo > 0 and len(collected_links) >= colvo:
-                collected_links = set(list(collected_links)[:colvo])
-                logger.info(f"Достигнуто целевое количество ссылок: {colvo}")
-                return list(collected_links)
-        except Exception as e:
-            logger.warning(f"Ошибка при чтении {temp_file}: {e}")
-
-    while True:
-        logger.info(f"Прокрутка страницы, собрано ссылок: {len(collected_links)}")
-        # Плавная прокрутка с помощью мыши
-        await page.mouse.wheel(0, scroll_step)
-        await page.wait_for_timeout(scroll_interval * 1000)
-        current_position += scroll_step
-
-        try:
-            # Ожидаем появления элементов
-            await page.wait_for_selector(css_selector, timeout=pause_time * 1000)
-            new_links = await page.eval_on_selector_all(
-                css_selector, "elements => elements.map(el => el.getAttribute('href'))"
-            )
-            new_links = [link for link in new_links if link and "/product/" in link]
-            collected_links.update(new_links)
-            logger.info(
-                f"Собрано новых ссылок: {len(new_links)}, всего: {len(collected_links)}"
+    try:
+        while True:
+            logger.info(f"Прокрутка страницы, собрано ссылок: {len(journal)}")
+            # Плавная прокрутка с помощью мыши
+            await page.mouse.wheel(0, scroll_step)
+            await page.wait_for_timeout(scroll_interval * 1000)
+            current_position += scroll_step
+
+            try:
+                # Ожидаем появления элементов
+                await page.wait_for_selector(css_selector, timeout=pause_time * 1000)
+                page_links = await page.eval_on_selector_all(
+                    css_selector, "elements => elements.map(el => el.getAttribute('href'))"
+                )
+                # В журнал дописываются только ранее не встречавшиеся товары
+                new_links = journal.add(link for link in page_links if link)
+                logger.info(f"Собрано новых ссылок: {len(new_links)}, всего: {len(journal)}")
+            except Exception as e:
+                logger.warning(f"Ошибка при поиске ссылок: {e}")
+
+            # Проверка высоты страницы
+            new_height = await page.evaluate("() => document.body.scrollHeight")
+            logger.debug(
+                f"Позиция: {current_position}, Новая высота: {new_height}, Старая высота: {last_height}"
             )
+            # Если достигли конца страницы
+            if current_position >= new_height:
+                if new_height == last_height:
+                    attempts += 1
+                    logger.info(
+                        f"Новых ссылок не найдено, попытка {attempts}/{max_attempts}"
+                    )
+                    if attempts >= max_attempts:
+                        logger.info("Достигнут конец страницы, новых ссылок больше нет")
+                        break
+                else:
+                    attempts = 0
+                last_height = new_height
+                current_position = new_height
+
+            if colvo > 0 and len(journal) >= colvo:
+                logger.info(f"Достигнуто целевое количество ссылок: {colvo}")
+                break
+    finally:
+        journal.close()
+
+    links = journal.links(colvo)
+    logger.info(f"Итоговое количество собранных ссылок: {len(links)}")
+    return links
+
 
-            # Сохраняем ссылки в файл
+def _parse_search_response(text: str) -> Tuple[list[str], Optional[str]]:
+    """Извлекает канонические ссылки на товары и путь следующей страницы из ответа поиска."""
+    links = [f"{OZON_ORIGIN}/product/{product_id}/" for product_id in _API_PRODUCT_LINK_RE.findall(text)]
+    match = _API_NEXT_PAGE_RE.search(text)
+    next_page = json.loads(f'"{match.group(1)}"') if match and match.group(1) else None
+    return links, next_page
+
+
+async def collect_links_via_api(
+    page: Page,
+    colvo: int = 0,
+    temp_file: str = "temp_links.txt",
+    pause_time: float = 0.3,
+    max_pages: int = 1000,
+) -> Optional[list[str]]:
+    """Собирает ссылки, запрашивая постраничный JSON поиска напрямую.
+
+    Возвращает None, если эндпоинт недоступен и нужно вернуться к прокрутке.
+    """
+    journal = LinkJournal(temp_file)
+    parts = urlsplit(page.url)
+    next_page = f"{parts.path}?{parts.query}" if parts.query else parts.path
+    pages_loaded = 0
+    try:
+        while next_page and pages_loaded < max_pages:
             try:
-                with open(temp_file, "w", encoding="utf-8") as f:
-                    for link in collected_links:
-                        f.write(f"{link}\n")
-                logger.debug(f"Ссылки сохранены в {temp_file}")
+                response = await page.request.get(PAGE_API_URL + quote(next_page, safe=""))
+                if not response.ok:
+                    raise RuntimeError(f"HTTP {response.status}")
+                text = await response.text()
             except Exception as e:
-                logger.warning(f"Ошибка при сохранении в {temp_file}: {e}")
-        except Exception as e:
-            logger.warning(f"Ошибка при поиске ссылок: {e}")
-
-        # Проверка высоты страницы
-        new_height = await page.evaluate("() => document.body.scrollHeight")
-        logger.debug(
-            f"Позиция: {current_position}, Новая высота: {new_height}, Старая высота: {last_height}"
-        )
-        # Если достигли конца страницы
-        if current_position >= new_height:
-            if new_height == last_height:
-                attempts += 1
-                logger.info(
-                    f"Новых ссылок не найдено, попытка {attempts}/{max_attempts}"
-                )
-                if attempts >= max_attempts:
-                    logger.info("Достигнут конец страницы, новых ссылок больше нет")
-                    break
-            else:
-                attempts = 0
-            last_height = new_height
-            current_position = new_height
-
-        # Если colvo > 0 и собрано достаточно ссылок, обрезаем список
-        if colvo > 0 and len(collected_links) >= colvo:
-            collected_links = set(list(collected_links)[:colvo])
-            logger.info(f"Достигнуто целевое количество ссылок: {colvo}")
-            break
-
-    logger.info(f"Итоговое количество собранных ссылок: {len(collected_links)}")
-    return list(collected_links)
+                logger.warning(f"Ошибка при запросе страницы поиска {next_page}: {e}")
+                if not pages_loaded:
+                    return None
+                break
+            pages_loaded += 1
+
+            links, next_page = _parse_search_response(text)
+            new_links = journal.add(links)
+            logger.info(
+                f"Страница поиска {pages_loaded}: новых ссылок {len(new_links)}, всего {len(journal)}"
+            )
+
+            if colvo > 0 and len(journal) >= colvo:
+                logger.info(f"Достигнуто целевое количество ссылок: {colvo}")
+                break
+            if not links:
+                logger.info("Страница поиска без товаров, сбор завершён")
+                break
+            if next_page:
+                await asyncio.sleep(pause_time)
+    finally:
+        journal.close()
+
+    result = journal.links(colvo)
+    logger.info(f"Итоговое количество собранных ссылок: {len(result)}")
+    return result
@@ -0,0 +1,75 @@
+import json
+import os
+import re
+import time
+from typing import Optional, Tuple
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+_SELLER_RE = re.compile(r"/seller/([^/?#]+)")
+
+
+def seller_key(seller_href: Optional[str]) -> Optional[str]:
+    """Возвращает ключ продавца из ссылки, без домена, параметров и слеша в конце."""
+    if not seller_href:
+        return None
+    match = _SELLER_RE.search(seller_href)
+    return match.group(1) if match else None
+
+
+class SellerCache:
+    """Кэш данных о продавце и ИНН по ссылке на продавца с TTL и хранением на диске."""
+
+    def __init__(self, path: str = "sellers_cache.json", ttl_hours: float = 72.0, save_every: int = 20):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.save_every = save_every
+        self.entries: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self._unsaved = 0
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+                logger.info(f"Загружено {len(self.entries)} продавцов из кэша {path}")
+            except Exception as e:
+                logger.warning(f"Ошибка при чтении кэша продавцов {path}: {e}")
+
+    def get(self, seller_href: Optional[str]) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """Возвращает (данные о продавце, ИНН) из кэша или None, если записи нет или она устарела."""
+        key = seller_key(seller_href)
+        entry = self.entries.get(key) if key else None
+        if entry is None or time.time() - entry["ts"] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["details"], entry["inn"]
+
+    def put(self, seller_href: Optional[str], details: Optional[str], inn: Optional[str]) -> None:
+        """Сохраняет данные о продавце; пустые результаты не кэшируются."""
+        key = seller_key(seller_href)
+        if not key or (not details and not inn):
+            return
+        self.entries[key] = {"details": details, "inn": inn, "ts": time.time()}
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def save(self) -> None:
+        """Атомарно записывает кэш на диск."""
+        if not self._unsaved:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._unsaved = 0
+        except Exception as e:
+            logger.warning(f"Ошибка при сохранении кэша продавцов {self.path}: {e}")
+
+    def close(self) -> None:
+        self.save()
+        logger.info(f"Кэш продавцов: попаданий {self.hits}, промахов {self.misses}")
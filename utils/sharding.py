@@ -0,0 +1,319 @@
+import asyncio
+import multiprocessing
+import queue
+import signal
+from typing import Any, Iterable, Optional
+from utils.logger import configure_worker_logging, relay_worker_logs, setup_logger
+from utils.archive import PageArchive
+from utils.blocking import build_blocker
+from utils.fixtures import FixtureRecorder
+from utils.http_fetch import HttpFetcher
+from utils.memory import MemoryMonitor
+from utils.metrics import ProgressLog, RunMetrics
+from utils.prepare_work import preparation_before_work
+from utils.product_data import collect_data
+from utils.seller_cache import SellerCache
+
+logger = setup_logger()
+
+# Дочерние процессы запускаются через spawn: fork процесса с циклом событий и потоками небезопасен
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def shard_products(products_urls: dict[str, str], shards: int) -> list[dict[str, str]]:
+    """Делит товары на shards частей по очереди, чтобы части были равными по размеру."""
+    parts: list[dict[str, str]] = [{} for _ in range(shards)]
+    for index, (product_id, url) in enumerate(products_urls.items()):
+        parts[index % shards][product_id] = url
+    return [part for part in parts if part]
+
+
+class _Events:
+    """Канал событий воркера: вызовы методов общих объектов выполняет координатор."""
+
+    def __init__(self, events, shard_id: int):
+        self.events = events
+        self.shard_id = shard_id
+
+    def send(self, target: str, method: str, *args: Any) -> None:
+        self.events.put((self.shard_id, target, method, args))
+
+
+class ShardStore:
+    """Хранилище воркера: строки передаются в единое хранилище координатора."""
+
+    def __init__(self, events: _Events):
+        self.events = events
+
+    def write_rows(self, rows: Iterable[dict]) -> None:
+        self.events.send("store", "write_rows", [dict(row) for row in rows])
+
+    def buffered(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+class ShardCheckpoint:
+    """Контрольные точки воркера: состояние товаров ведёт координатор."""
+
+    def __init__(self, events: _Events):
+        self.events = events
+
+    def mark_in_flight(self, query: str, product_id: str) -> None:
+        self.events.send("checkpoint", "mark_in_flight", query, product_id)
+
+    def mark_finished(self, query: str, product_id: str, row: dict) -> None:
+        self.events.send("checkpoint", "mark_finished", query, product_id, row)
+
+    def mark_failed(self, query: str, product_id: str, error: str) -> None:
+        self.events.send("checkpoint", "mark_failed", query, product_id, error)
+
+    def mark_exported(self, keys: Iterable[tuple[str, str]]) -> None:
+        self.events.send("checkpoint", "mark_exported", list(keys))
+
+
+class ShardHistory:
+    """История цен воркера: записи сохраняет координатор."""
+
+    def __init__(self, events: _Events):
+        self.events = events
+
+    def record(self, product_id: str, row: dict) -> None:
+        self.events.send("history", "record", product_id, row)
+
+
+class ShardSellerCache(SellerCache):
+    """Кэш продавцов воркера: читается из общего файла, а новые записи сохраняет координатор."""
+
+    def __init__(self, events: _Events, path: str, ttl_hours: float):
+        super().__init__(path=path, ttl_hours=ttl_hours)
+        self.events = events
+
+    def put(self, seller_href: Optional[str], details: Optional[str], inn: Optional[str]) -> None:
+        super().put(seller_href, details, inn)
+        self.events.send("seller_cache", "put", seller_href, details, inn)
+
+    def save(self) -> None:
+        pass
+
+
+class ShardProgressLog(ProgressLog):
+    """Прогресс воркера передаётся координатору, который выводит общую строку."""
+
+    def __init__(self, events: _Events):
+        super().__init__(total=0)
+        self.events = events
+
+    def update(self, ok: bool = True) -> None:
+        self.events.send("progress", "update", ok)
+
+
+async def _watch_stop(stop, stop_event: asyncio.Event) -> None:
+    while not stop.is_set():
+        await asyncio.sleep(0.5)
+    stop_event.set()
+
+
+async def _run_shard(
+    shard_id: int, query: str, products_urls: dict[str, str], options: dict[str, Any], events, stop
+) -> None:
+    channel = _Events(events, shard_id)
+    stop_event = asyncio.Event()
+    watcher = asyncio.create_task(_watch_stop(stop, stop_event))
+    browser = None
+    fetcher = None
+    metrics = RunMetrics(path=options["metrics_file"] or None)
+    # Воркеры пишут в общий запуск архива, каждый в свой манифест
+    archive = (
+        PageArchive(options["archive_dir"], options["archive_run"], writer=f"shard-{shard_id}")
+        if options["archive_dir"]
+        else None
+    )
+    seller_cache = (
+        ShardSellerCache(channel, options["seller_cache_file"], options["seller_cache_ttl"])
+        if options["seller_cache_file"]
+        else None
+    )
+    try:
+        page, browser = await preparation_before_work(
+            item_name=query, headless=options["headless"], profile_dir=options["browser_profile"]
+        )
+        blocker = build_blocker(
+            enabled=options["block_resources"],
+            blocked_types=options["block_types"],
+            blocked_domains=options["block_domains"],
+            allowed_domains=options["allow_domains"],
+        )
+        if blocker:
+            await blocker.install(page.context)
+        if options["fetch_mode"] == "http":
+            fetcher = HttpFetcher(page, concurrency=options["http_concurrency"])
+            await fetcher.start()
+        await collect_data(
+            products_urls=products_urls,
+            page=page,
+            output_file=options["output_file"],
+            concurrency=options["concurrency"],
+            rate_limit=options["rate_limit"],
+            blocker=blocker,
+            parse_workers=options["parse_workers"],
+            seller_cache=seller_cache,
+            store=ShardStore(channel),
+            extra_fields=options["extra_fields"],
+            metrics=metrics,
+            recorder=(
+                FixtureRecorder(options["record_fixtures"]) if options["record_fixtures"] else None
+            ),
+            memory=MemoryMonitor(high_water_mb=options["memory_high_water"]),
+            checkpoint=ShardCheckpoint(channel),
+            query=query,
+            stop_event=stop_event,
+            max_retries=options["max_retries"],
+            retry_rounds=options["retry_rounds"],
+            retry_concurrency=options["retry_concurrency"],
+            retry_backoff=options["retry_backoff"],
+            history=ShardHistory(channel) if options["incremental"] else None,
+            fetcher=fetcher,
+            progress_log=ShardProgressLog(channel),
+            archive=archive,
+        )
+    finally:
+        watcher.cancel()
+        metrics.close()
+        if archive:
+            archive.close()
+        if seller_cache:
+            seller_cache.close()
+        if fetcher:
+            await fetcher.close()
+        if browser:
+            await browser.close()
+
+
+def run_shard(
+    shard_id: int,
+    query: str,
+    products_urls: dict[str, str],
+    options: dict[str, Any],
+    events,
+    stop,
+    log_queue,
+    log_level: int,
+) -> None:
+    """Точка входа процесса-воркера: свой браузер и свой цикл событий на часть товаров."""
+    # Ctrl+C обрабатывает координатор и передаёт остановку через stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_worker_logging(log_queue, log_level, prefix=f"[воркер {shard_id}] ")
+    asyncio.run(_run_shard(shard_id, query, products_urls, options, events, stop))
+
+
+def _shard_options(options: dict[str, Any], shard_id: int, shards: int) -> dict[str, Any]:
+    """Параметры конкретного воркера: общий лимит частоты делится между процессами."""
+    options = dict(options)
+    options["rate_limit"] = options["rate_limit"] / shards if options["rate_limit"] else 0.0
+    # Каталог профиля Chromium не может использоваться двумя браузерами одновременно
+    if options["browser_profile"]:
+        options["browser_profile"] = f"{options['browser_profile']}_{shard_id}"
+    # Процесс-воркер сам занимает ядро, поэтому по умолчанию разбирает HTML у себя
+    if options["parse_workers"] is None:
+        options["parse_workers"] = 0
+    return options
+
+
+async def run_sharded(
+    query: str,
+    products_urls: dict[str, str],
+    workers: int,
+    options: dict[str, Any],
+    store,
+    checkpoint,
+    history=None,
+    seller_cache: Optional[SellerCache] = None,
+    progress_handler=None,
+    stop_event: Optional[asyncio.Event] = None,
+) -> None:
+    """Обрабатывает товары запроса в workers процессах, каждый со своим браузером.
+
+    Координатор принимает от воркеров строки, состояния товаров, записи истории
+    цен и кэша продавцов и ведёт единые хранилище, контрольные точки и прогресс.
+    После установки stop_event воркеры дообрабатывают начатые товары и завершаются.
+    """
+    shards = shard_products(products_urls, workers)
+    total = len(products_urls)
+    progress = ProgressLog(total)
+    if progress_handler:
+        progress_handler.set_total(total)
+    targets = {
+        "store": store,
+        "checkpoint": checkpoint,
+        "history": history,
+        "seller_cache": seller_cache,
+    }
+
+    def dispatch(message: tuple) -> None:
+        shard_id, target, method, args = message
+        if target == "progress":
+            progress.update(*args)
+            if progress_handler:
+                progress_handler.update()
+            return
+        # Строки, которые хранилище ещё держит в памяти, отмечаются после его закрытия
+        if method == "mark_exported" and store.buffered():
+            return
+        if targets.get(target) is not None:
+            getattr(targets[target], method)(*args)
+
+    events = _CONTEXT.Queue()
+    log_queue = _CONTEXT.Queue()
+    stop = _CONTEXT.Event()
+    log_listener = relay_worker_logs(log_queue)
+    processes = [
+        _CONTEXT.Process(
+            target=run_shard,
+            args=(
+                shard_id,
+                query,
+                shard,
+                _shard_options(options, shard_id, len(shards)),
+                events,
+                stop,
+                log_queue,
+                logger.getEffectiveLevel(),
+            ),
+            name=f"shard-{shard_id}",
+        )
+        for shard_id, shard in enumerate(shards, start=1)
+    ]
+    logger.info(f"Запуск {len(processes)} процессов, товаров в каждом: {[len(s) for s in shards]}")
+    loop = asyncio.get_running_loop()
+    try:
+        for process in processes:
+            process.start()
+        while True:
+            if stop_event is not None and stop_event.is_set() and not stop.is_set():
+                stop.set()
+            try:
+                message = await loop.run_in_executor(None, events.get, True, 0.5)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    break
+                continue
+            dispatch(message)
+        # Сообщения, отправленные воркерами перед самым завершением
+        while True:
+            try:
+                dispatch(events.get_nowait())
+            except queue.Empty:
+                break
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+            if process.exitcode:
+                logger.warning(f"Процесс {process.name} завершился с кодом {process.exitcode}")
+        log_listener.stop()
+        if progress.processed < total:
+            progress.log()
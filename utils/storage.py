@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import zlib
+from typing import Any, Iterable
+from utils.logger import setup_logger
+from utils.normalize import COLUMN_TYPES, coerce_value
+from utils.output_writer import KEY_COLUMN, StreamingExcelWriter
+from utils.records import COLUMNS, EXTRA_COLUMNS
+
+logger = setup_logger()
+
+OUTPUT_FORMATS = ("xlsx", "sqlite", "parquet")
+SQL_TYPES = {"int": "INTEGER", "float": "REAL"}
+
+
+def output_path_for(output_format: str, output_file: str) -> str:
+    """Возвращает путь к хранилищу выбранного формата по имени выходного файла."""
+    base, ext = os.path.splitext(output_file)
+    if output_format == "sqlite":
+        return output_file if ext in (".db", ".sqlite", ".sqlite3") else f"{base}.sqlite"
+    if output_format == "parquet":
+        return output_file if ext == ".parquet" else f"{base}.parquet"
+    return output_file if ext == ".xlsx" else f"{base}.xlsx"
+
+
+def _keyed_rows(rows: Iterable[dict]) -> list[dict]:
+    """Оставляет строки с артикулом, последняя строка для артикула побеждает."""
+    keyed: dict[str, dict] = {}
+    for row in rows:
+        key = row.get(KEY_COLUMN)
+        if key is None or key == "":
+            logger.warning(f"Строка без артикула пропущена: {row.get('Ссылка на товар')}")
+            continue
+        keyed[str(key)] = row
+    return list(keyed.values())
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+class SQLiteStore:
+    """Хранилище результатов в SQLite с upsert по артикулу."""
+
+    def __init__(self, path: str, table: str = "products"):
+        self.path = path
+        self.table = table
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {_quote(table)} ({_quote(KEY_COLUMN)} TEXT PRIMARY KEY)"
+        )
+        self.columns = [
+            info[1]
+            for info in self.connection.execute(f"PRAGMA table_info({_quote(table)})")
+        ]
+        logger.info(f"Открыто SQLite-хранилище {path}")
+
+    def _ensure_columns(self, rows: list[dict]) -> None:
+        """Добавляет в таблицу столбцы, которых ещё нет."""
+        for row in rows:
+            for column in row:
+                if column not in self.columns:
+                    column_type = SQL_TYPES.get(COLUMN_TYPES.get(column), "")
+                    self.connection.execute(
+                        f"ALTER TABLE {_quote(self.table)} ADD COLUMN {_quote(column)} {column_type}"
+                    )
+                    self.columns.append(column)
+
+    def write_rows(self, rows: Iterable[dict]) -> None:
+        """Записывает пачку строк одной транзакцией с upsert по артикулу."""
+        rows = _keyed_rows(rows)
+        if not rows:
+            return
+        with self.connection:
+            self._ensure_columns(rows)
+            columns = self.columns
+            updates = ", ".join(
+                f"{_quote(c)}=excluded.{_quote(c)}" for c in columns if c != KEY_COLUMN
+            )
+            statement = (
+                f"INSERT INTO {_quote(self.table)} ({', '.join(map(_quote, columns))}) "
+                f"VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT({_quote(KEY_COLUMN)}) DO "
+                + (f"UPDATE SET {updates}" if updates else "NOTHING")
+            )
+            self.connection.executemany(
+                statement, [[coerce_value(c, row.get(c)) for c in columns] for row in rows]
+            )
+        logger.debug(f"В {self.path} записано строк: {len(rows)}")
+
+    def buffered(self) -> int:
+        """Число строк, принятых, но ещё не записанных на диск."""
+        return 0
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class ParquetStore:
+    """Хранилище результатов в Parquet, разбитое на бакеты по артикулу, с upsert.
+
+    Все бакеты пишутся с одной схемой: столбцы записи, известные дополнительные
+    столбцы и типы из COLUMN_TYPES. Иначе схема набора данных бралась бы из
+    одного файла, и столбцы, которых в нём нет (например «Запрос»), терялись бы
+    при чтении каталога целиком.
+    """
+
+    def __init__(self, path: str, buckets: int = 16, batch_size: int = 500):
+        try:
+            import pyarrow as pa
+            import pyarrow.compute as pc
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Для формата parquet установите пакет pyarrow") from e
+        self.pa, self.pc, self.pq = pa, pc, pq
+        self.path = path
+        self.buckets = buckets
+        self.batch_size = batch_size
+        self.pending: dict[str, dict] = {}
+        self.columns = [column for _, column in COLUMNS] + list(EXTRA_COLUMNS)
+        os.makedirs(path, exist_ok=True)
+        # Столбцы вне схемы из прежних запусков сохраняются во всех бакетах
+        for bucket in range(buckets):
+            if os.path.exists(self._bucket_file(bucket)):
+                self._add_columns(self.pq.read_schema(self._bucket_file(bucket)).names)
+        logger.info(f"Открыто Parquet-хранилище {path}")
+
+    def _bucket_of(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % self.buckets
+
+    def _bucket_file(self, bucket: int) -> str:
+        return os.path.join(self.path, f"bucket={bucket:02d}", "data.parquet")
+
+    def write_rows(self, rows: Iterable[dict]) -> None:
+        """Буферизует строки и сбрасывает их пачкой при накоплении batch_size."""
+        for row in _keyed_rows(rows):
+            self.pending[str(row[KEY_COLUMN])] = row
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def buffered(self) -> int:
+        """Число строк, принятых, но ещё не записанных на диск."""
+        return len(self.pending)
+
+    def flush(self) -> None:
+        """Переписывает только затронутые бакеты, заменяя строки с теми же артикулами."""
+        if not self.pending:
+            return
+        by_bucket: dict[int, list[dict]] = {}
+        for key, row in self.pending.items():
+            by_bucket.setdefault(self._bucket_of(key), []).append(row)
+
+        for rows in by_bucket.values():
+            self._add_columns(column for row in rows for column in row)
+        for bucket, rows in by_bucket.items():
+            bucket_file = self._bucket_file(bucket)
+            new_table = self._to_table(rows)
+            if os.path.exists(bucket_file):
+                existing = self._conform(self.pq.read_table(bucket_file))
+                keys = self.pa.array([str(row[KEY_COLUMN]) for row in rows])
+                keep = self.pc.invert(self.pc.is_in(existing[KEY_COLUMN], value_set=keys))
+                new_table = self.pa.concat_tables([existing.filter(keep), new_table])
+            os.makedirs(os.path.dirname(bucket_file), exist_ok=True)
+            tmp_file = f"{bucket_file}.tmp"
+            self.pq.write_table(new_table, tmp_file)
+            os.replace(tmp_file, bucket_file)
+        logger.debug(f"В {self.path} записано строк: {len(self.pending)}")
+        self.pending.clear()
+
+    def _arrow_type(self, column: str):
+        column_type = COLUMN_TYPES.get(column)
+        if column_type == "int":
+            return self.pa.int64()
+        if column_type == "float":
+            return self.pa.float64()
+        return self.pa.string()
+
+    def _column_value(self, column: str, value: Any) -> Any:
+        if value is None:
+            return None
+        if COLUMN_TYPES.get(column) is None:
+            return str(value)
+        return coerce_value(column, value)
+
+    def _add_columns(self, columns: Iterable[str]) -> bool:
+        """Дописывает в схему неизвестные столбцы; True, если схема изменилась."""
+        added = [column for column in dict.fromkeys(columns) if column not in self.columns]
+        if added:
+            # Такие столбцы есть не во всех бакетах: их стоит добавить в EXTRA_COLUMNS
+            logger.warning(f"Столбцы вне схемы Parquet-хранилища: {added}")
+            self.columns.extend(added)
+        return bool(added)
+
+    def _schema(self):
+        return self.pa.schema([(c, self._arrow_type(c)) for c in self.columns])
+
+    def _to_table(self, rows: list[dict]):
+        return self.pa.Table.from_pylist(
+            [{c: self._column_value(c, row.get(c)) for c in self.columns} for row in rows],
+            schema=self._schema(),
+        )
+
+    def _conform(self, table):
+        """Приводит бакет прежних запусков к схеме хранилища.
+
+        Недостающие столбцы заполняются пустыми значениями, а строковые цены
+        и рейтинг прежних версий приводятся к числовым типам.
+        """
+        arrays = []
+        for field in self._schema():
+            if field.name not in table.column_names:
+                arrays.append(self.pa.nulls(table.num_rows, type=field.type))
+                continue
+            column = table.column(field.name)
+            if column.type != field.type:
+                column = self.pa.array(
+                    [self._column_value(field.name, value) for value in column.to_pylist()],
+                    type=field.type,
+                )
+            arrays.append(column)
+        return self.pa.Table.from_arrays(arrays, schema=self._schema())
+
+    def close(self) -> None:
+        self.flush()
+
+
+def open_store(output_format: str = "xlsx", output_file: str = "ozon_products.xlsx"):
+    """Открывает хранилище результатов выбранного формата."""
+    path = output_path_for(output_format, output_file)
+    if output_format == "sqlite":
+        return SQLiteStore(path)
+    if output_format == "parquet":
+        return ParquetStore(path)
+    if output_format == "xlsx":
+        return StreamingExcelWriter(filename=path)
+    raise ValueError(f"Неизвестный формат вывода: {output_format}")
@@ -0,0 +1,51 @@
+import os
+import re
+from typing import Iterable, Optional
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+OZON_ORIGIN = "https://www.ozon.ru"
+# JSON-представление любой страницы Ozon: состояния виджетов без HTML и скриптов
+PAGE_API_URL = f"{OZON_ORIGIN}/api/entrypoint-api.bx/page/json/v2?url="
+_PRODUCT_ID_RE = re.compile(r"/product/(?:[^/?#]*-)?(\d+)(?:[/?#]|$)")
+
+
+def product_id_from_url(url: str) -> Optional[str]:
+    """Извлекает числовой id товара из конца пути /product/<slug>-<id>/."""
+    match = _PRODUCT_ID_RE.search(url or "")
+    return match.group(1) if match else None
+
+
+def canonical_product_url(url: str) -> Optional[str]:
+    """Приводит ссылку на товар к виду https://www.ozon.ru/product/<id>/ без трекинга."""
+    product_id = product_id_from_url(url)
+    return f"{OZON_ORIGIN}/product/{product_id}/" if product_id else None
+
+
+def dedupe_product_urls(urls: Iterable[str]) -> dict[str, str]:
+    """Возвращает канонические ссылки по id товара, сохраняя порядок первого появления."""
+    products: dict[str, str] = {}
+    skipped = 0
+    for url in urls:
+        product_id = product_id_from_url(url)
+        if product_id is None:
+            skipped += 1
+            continue
+        products.setdefault(product_id, f"{OZON_ORIGIN}/product/{product_id}/")
+    if skipped:
+        logger.warning(f"Пропущено ссылок без id товара: {skipped}")
+    return products
+
+
+def load_processed_ids(processed_file: str) -> set[str]:
+    """Загружает id уже обработанных товаров; понимает и старые ссылки с ?at=."""
+    processed_ids: set[str] = set()
+    if not os.path.exists(processed_file):
+        return processed_ids
+    with open(processed_file, "r", encoding="utf-8") as f:
+        for line in f:
+            product_id = product_id_from_url(line.strip())
+            if product_id:
+                processed_ids.add(product_id)
+    return processed_ids
@@ -0,0 +1,87 @@
+import random
+import time
+from typing import Iterable, Optional
+from playwright.async_api import Page
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Promise.race по селекторам: ожидание завершается, как только в DOM появился любой из них
+_WAIT_FOR_ANY_SCRIPT = """
+async ({ selectors, timeout }) => {
+    const observers = [];
+    const waitFor = (selector) => new Promise((resolve) => {
+        if (document.querySelector(selector)) {
+            resolve(selector);
+            return;
+        }
+        const observer = new MutationObserver(() => {
+            if (document.querySelector(selector)) {
+                observer.disconnect();
+                resolve(selector);
+            }
+        });
+        observer.observe(document, { childList: true, subtree: true });
+        observers.push(observer);
+    });
+    let timer;
+    const timeoutPromise = new Promise((resolve) => {
+        timer = setTimeout(() => resolve(null), timeout);
+    });
+    const winner = await Promise.race([...selectors.map(waitFor), timeoutPromise]);
+    clearTimeout(timer);
+    observers.forEach((observer) => observer.disconnect());
+    return winner;
+}
+"""
+
+
+class WaitStats:
+    """Фактическая длительность ожиданий по их названиям."""
+
+    def __init__(self):
+        self.durations: dict[str, list[float]] = {}
+        self.timeouts: dict[str, int] = {}
+
+    def record(self, name: str, seconds: float, found: bool) -> None:
+        self.durations.setdefault(name, []).append(seconds)
+        if not found:
+            self.timeouts[name] = self.timeouts.get(name, 0) + 1
+
+    def log_summary(self) -> None:
+        for name, durations in self.durations.items():
+            ordered = sorted(durations)
+            median = ordered[len(ordered) // 2]
+            logger.info(
+                f"Ожидание «{name}»: {len(ordered)} раз, медиана {median:.2f} с, "
+                f"максимум {ordered[-1]:.2f} с, таймаутов {self.timeouts.get(name, 0)}"
+            )
+
+
+wait_stats = WaitStats()
+
+
+async def wait_for_any(
+    page: Page,
+    selectors: Iterable[str],
+    timeout: float = 5000,
+    name: str = "selectors",
+) -> Optional[str]:
+    """Ждёт появления любого из селекторов и возвращает первый найденный или None."""
+    selectors = list(selectors)
+    started = time.perf_counter()
+    try:
+        found = await page.evaluate(
+            _WAIT_FOR_ANY_SCRIPT, {"selectors": selectors, "timeout": timeout}
+        )
+    except Exception as e:
+        # Контекст страницы мог смениться из-за навигации во время ожидания
+        logger.debug(f"Ошибка при ожидании {selectors}: {e}")
+        found = None
+    wait_stats.record(name, time.perf_counter() - started, found is not None)
+    return found
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 10.0) -> float:
+    """Экспоненциальная задержка со случайным разбросом (full jitter) для попытки attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,91 @@
+import re
+from typing import Any, Iterable
+from playwright.async_api import Page
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+PRODUCT_WIDGETS = (
+    "webPrice",
+    "webProductHeading",
+    "webSingleProductScore",
+    "webCurrentSeller",
+    "webDetailSKU",
+    "breadCrumbs",
+)
+
+# Страница товара готова, как только появился любой из нужных виджетов
+PRODUCT_READY_SELECTORS = (
+    "div[data-widget='webProductHeading']",
+    "[id^='state-webPrice']",
+)
+# Ключи widgetStates в JSON страницы имеют вид webPrice-3121879-default-1, как id state-* в DOM
+_STATE_KEY_RE = re.compile(r"^([A-Za-z]+)-")
+
+# Забирает со страницы только атрибуты data-state нужных виджетов, без всего DOM
+_WIDGET_STATES_SCRIPT = """
+(names) => {
+    const states = {};
+    for (const el of document.querySelectorAll('[id^="state-"][data-state]')) {
+        const match = el.id.match(/^state-([A-Za-z]+)-/);
+        if (match && names.includes(match[1]) && !(match[1] in states)) {
+            states[match[1]] = el.getAttribute('data-state');
+        }
+    }
+    return states;
+}
+"""
+
+# Состояния всех виджетов с ключами без префикса state-, как в widgetStates JSON страницы
+_ALL_WIDGET_STATES_SCRIPT = """
+() => {
+    const states = {};
+    for (const el of document.querySelectorAll('[id^="state-"][data-state]')) {
+        states[el.id.slice(6)] = el.getAttribute('data-state');
+    }
+    return states;
+}
+"""
+
+
+async def fetch_widget_states(
+    page: Page, names: Iterable[str] = PRODUCT_WIDGETS
+) -> dict[str, str]:
+    """Получает неразобранные JSON-состояния виджетов страницы товара."""
+    try:
+        raw_states = await page.evaluate(_WIDGET_STATES_SCRIPT, list(names))
+    except Exception as e:
+        logger.warning(f"Ошибка при получении состояний виджетов: {e}")
+        return {}
+    return raw_states or {}
+
+
+async def fetch_all_widget_states(page: Page) -> dict[str, str]:
+    """Получает состояния всех виджетов страницы для архива, без отбора по названию.
+
+    Ключи имеют вид webPrice-3121879-default-1; нужные виджеты из них выбирает
+    states_from_page_json({"widgetStates": ...}).
+    """
+    try:
+        raw_states = await page.evaluate(_ALL_WIDGET_STATES_SCRIPT)
+    except Exception as e:
+        logger.warning(f"Ошибка при получении состояний виджетов: {e}")
+        return {}
+    return raw_states or {}
+
+
+def states_from_page_json(
+    payload: dict[str, Any], names: Iterable[str] = PRODUCT_WIDGETS
+) -> dict[str, str]:
+    """Выбирает состояния нужных виджетов из widgetStates ответа JSON-эндпоинта страницы."""
+    names = set(names)
+    states: dict[str, str] = {}
+    widget_states = payload.get("widgetStates")
+    if not isinstance(widget_states, dict):
+        return states
+    for key, raw in widget_states.items():
+        match = _STATE_KEY_RE.match(key)
+        if match and match.group(1) in names and match.group(1) not in states:
+            states[match.group(1)] = raw
+    return states
+
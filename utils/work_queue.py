@@ -0,0 +1,525 @@
+import json
+from abc import ABC, abstractmethod
+import sqlite3
+import time
+import uuid
+from typing import Callable, Iterator, Optional
+from urllib.parse import urlsplit
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Состояния задачи очереди
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"
+
+# Ошибка задачи, аренда которой истекала max_attempts раз (воркер падал или зависал)
+LEASE_EXPIRED = "lease_expired"
+
+
+class Lease:
+    """Аренда задачи: товар запроса, выданный воркеру до истечения visibility timeout."""
+
+    __slots__ = ("query", "product_id", "url", "attempts", "token")
+
+    def __init__(self, query: str, product_id: str, url: str, attempts: int, token: str):
+        self.query = query
+        self.product_id = product_id
+        self.url = url
+        self.attempts = attempts
+        self.token = token
+
+
+class WorkQueue(ABC):
+    """Общая очередь товаров с арендой, подтверждением и очередью мёртвых задач.
+
+    Воркер берёт задачи через lease; пока аренда не истекла, другим воркерам они
+    не выдаются. ack сохраняет строку результата, nack возвращает задачу в очередь
+    с задержкой или, если попытки исчерпаны или ошибка неисправима, переносит её
+    в мёртвые. Задачи с истёкшей арендой снова выдаются другим воркерам.
+    Подтверждение с чужим или устаревшим токеном аренды игнорируется.
+    Бэкенд, не реализовавший какой-либо из абстрактных методов, не создаётся.
+    """
+
+    def __init__(self, max_attempts: int = 3):
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def put(self, query: str, products: dict[str, str], reset: bool = False) -> int:
+        """Добавляет товары запроса и возвращает число поставленных в очередь.
+
+        Уже известные товары не меняются, а с reset их завершённые и мёртвые задачи
+        снова становятся ожидающими с обнулёнными попытками; ожидающие и
+        арендованные задачи не трогаются.
+        """
+
+    @abstractmethod
+    def lease(
+        self, query: str, worker: str, limit: int = 1, visibility: float = 300.0
+    ) -> list[Lease]:
+        ...
+
+    @abstractmethod
+    def ack(self, lease: Lease, row: dict) -> bool:
+        ...
+
+    @abstractmethod
+    def nack(self, lease: Lease, error: str, retryable: bool = True, delay: float = 0.0) -> bool:
+        """Возвращает задачу в очередь; True, если она перенесена в мёртвые."""
+
+    @abstractmethod
+    def counts(self, query: str) -> dict[str, int]:
+        ...
+
+    @abstractmethod
+    def rows(self, query: Optional[str] = None) -> Iterator[dict]:
+        """Строки результатов подтверждённых задач (для сборки общего файла)."""
+
+    def active(self, query: str) -> bool:
+        """Есть ли у запроса задачи, которые ещё ждут обработки или обрабатываются."""
+        counts = self.counts(query)
+        return counts.get(PENDING, 0) + counts.get(LEASED, 0) > 0
+
+    def close(self) -> None:
+        pass
+
+    def _dead(self, lease: Lease, retryable: bool) -> bool:
+        return not retryable or lease.attempts >= self.max_attempts
+
+
+class MemoryWorkQueue(WorkQueue):
+    """Очередь в памяти одного процесса: заменяет сетевую очередь в проверках."""
+
+    def __init__(self, max_attempts: int = 3):
+        super().__init__(max_attempts)
+        self.tasks: dict[tuple[str, str], dict] = {}
+
+    def put(self, query: str, products: dict[str, str], reset: bool = False) -> int:
+        added = 0
+        for product_id, url in products.items():
+            task = self.tasks.get((query, product_id))
+            if task is None or (reset and task["state"] in (DONE, DEAD)):
+                self.tasks[(query, product_id)] = {
+                    "url": url,
+                    "state": PENDING,
+                    "attempts": 0,
+                    "available_at": 0.0,
+                    "token": None,
+                    "expires": 0.0,
+                    "row": None,
+                    "error": None,
+                }
+                added += 1
+        return added
+
+    def lease(
+        self, query: str, worker: str, limit: int = 1, visibility: float = 300.0
+    ) -> list[Lease]:
+        now = time.time()
+        leases = []
+        for (task_query, product_id), task in self.tasks.items():
+            if len(leases) >= limit:
+                break
+            if task_query != query:
+                continue
+            ready = task["state"] == PENDING and task["available_at"] <= now
+            expired = task["state"] == LEASED and task["expires"] <= now
+            if not (ready or expired):
+                continue
+            if task["attempts"] >= self.max_attempts:
+                task.update(state=DEAD, error=LEASE_EXPIRED, token=None)
+                continue
+            task["attempts"] += 1
+            task.update(state=LEASED, token=uuid.uuid4().hex, expires=now + visibility)
+            leases.append(Lease(query, product_id, task["url"], task["attempts"], task["token"]))
+        return leases
+
+    def _owned(self, lease: Lease) -> Optional[dict]:
+        task = self.tasks.get((lease.query, lease.product_id))
+        return task if task and task["state"] == LEASED and task["token"] == lease.token else None
+
+    def ack(self, lease: Lease, row: dict) -> bool:
+        task = self._owned(lease)
+        if task is None:
+            return False
+        task.update(state=DONE, row=dict(row), error=None, token=None)
+        return True
+
+    def nack(self, lease: Lease, error: str, retryable: bool = True, delay: float = 0.0) -> bool:
+        task = self._owned(lease)
+        if task is None:
+            return False
+        dead = self._dead(lease, retryable)
+        task.update(
+            state=DEAD if dead else PENDING,
+            error=error,
+            token=None,
+            available_at=time.time() + delay,
+        )
+        return dead
+
+    def counts(self, query: str) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for (task_query, _), task in self.tasks.items():
+            if task_query == query:
+                counts[task["state"]] = counts.get(task["state"], 0) + 1
+        return counts
+
+    def rows(self, query: Optional[str] = None) -> Iterator[dict]:
+        for (task_query, _), task in self.tasks.items():
+            if task["row"] is not None and query in (None, task_query):
+                yield task["row"]
+
+
+_SQLITE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS tasks (
+        query TEXT NOT NULL,
+        product_id TEXT NOT NULL,
+        url TEXT NOT NULL,
+        state TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        available_at REAL NOT NULL DEFAULT 0,
+        lease_token TEXT,
+        leased_by TEXT,
+        lease_expires REAL,
+        row TEXT,
+        error TEXT,
+        updated REAL NOT NULL,
+        PRIMARY KEY (query, product_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (query, state, available_at)",
+)
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Очередь в файле SQLite: для нескольких процессов одной машины.
+
+    Выдача задач идёт в транзакции BEGIN IMMEDIATE, поэтому одну задачу
+    не получат два процесса одновременно.
+    """
+
+    def __init__(self, path: str = "work_queue.sqlite", max_attempts: int = 3):
+        super().__init__(max_attempts)
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SQLITE_SCHEMA:
+            self.connection.execute(statement)
+        logger.info(f"Открыта очередь задач {path}")
+
+    def _transaction(self, work: Callable[[], object]):
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = work()
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+        return result
+
+    def put(self, query: str, products: dict[str, str], reset: bool = False) -> int:
+        now = time.time()
+        conflict = (
+            "DO UPDATE SET url = excluded.url, state = excluded.state, attempts = 0, "
+            "available_at = 0, lease_token = NULL, leased_by = NULL, lease_expires = NULL, "
+            "row = NULL, error = NULL, updated = excluded.updated "
+            f"WHERE tasks.state IN ('{DONE}', '{DEAD}')"
+            if reset
+            else "DO NOTHING"
+        )
+
+        def insert() -> int:
+            return self.connection.executemany(
+                "INSERT INTO tasks (query, product_id, url, state, updated) "
+                f"VALUES (?, ?, ?, ?, ?) ON CONFLICT (query, product_id) {conflict}",
+                ((query, product_id, url, PENDING, now) for product_id, url in products.items()),
+            ).rowcount
+
+        return self._transaction(insert)
+
+    def lease(
+        self, query: str, worker: str, limit: int = 1, visibility: float = 300.0
+    ) -> list[Lease]:
+        now = time.time()
+
+        def take() -> list[Lease]:
+            candidates = self.connection.execute(
+                "SELECT product_id, url, attempts FROM tasks WHERE query = ? AND ("
+                "(state = ? AND available_at <= ?) OR (state = ? AND lease_expires <= ?)"
+                ") ORDER BY available_at LIMIT ?",
+                (query, PENDING, now, LEASED, now, limit),
+            ).fetchall()
+            leases = []
+            for product_id, url, attempts in candidates:
+                if attempts >= self.max_attempts:
+                    self.connection.execute(
+                        "UPDATE tasks SET state = ?, error = ?, lease_token = NULL, updated = ? "
+                        "WHERE query = ? AND product_id = ?",
+                        (DEAD, LEASE_EXPIRED, now, query, product_id),
+                    )
+                    continue
+                token = uuid.uuid4().hex
+                self.connection.execute(
+                    "UPDATE tasks SET state = ?, attempts = attempts + 1, lease_token = ?, "
+                    "leased_by = ?, lease_expires = ?, updated = ? "
+                    "WHERE query = ? AND product_id = ?",
+                    (LEASED, token, worker, now + visibility, now, query, product_id),
+                )
+                leases.append(Lease(query, product_id, url, attempts + 1, token))
+            return leases
+
+        return self._transaction(take)
+
+    def ack(self, lease: Lease, row: dict) -> bool:
+        return bool(
+            self.connection.execute(
+                "UPDATE tasks SET state = ?, row = ?, error = NULL, lease_token = NULL, updated = ? "
+                "WHERE query = ? AND product_id = ? AND state = ? AND lease_token = ?",
+                (
+                    DONE,
+                    json.dumps(row, ensure_ascii=False, default=str),
+                    time.time(),
+                    lease.query,
+                    lease.product_id,
+                    LEASED,
+                    lease.token,
+                ),
+            ).rowcount
+        )
+
+    def nack(self, lease: Lease, error: str, retryable: bool = True, delay: float = 0.0) -> bool:
+        dead = self._dead(lease, retryable)
+        now = time.time()
+        updated = self.connection.execute(
+            "UPDATE tasks SET state = ?, error = ?, available_at = ?, lease_token = NULL, updated = ? "
+            "WHERE query = ? AND product_id = ? AND state = ? AND lease_token = ?",
+            (
+                DEAD if dead else PENDING,
+                error,
+                now + delay,
+                now,
+                lease.query,
+                lease.product_id,
+                LEASED,
+                lease.token,
+            ),
+        ).rowcount
+        return dead and bool(updated)
+
+    def counts(self, query: str) -> dict[str, int]:
+        return dict(
+            self.connection.execute(
+                "SELECT state, COUNT(*) FROM tasks WHERE query = ? GROUP BY state", (query,)
+            ).fetchall()
+        )
+
+    def rows(self, query: Optional[str] = None) -> Iterator[dict]:
+        sql = "SELECT row FROM tasks WHERE row IS NOT NULL"
+        params: tuple = ()
+        if query is not None:
+            sql += " AND query = ?"
+            params = (query,)
+        for (row,) in self.connection.execute(sql, params):
+            yield json.loads(row)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+# Время берётся из часов сервера Redis: часы узлов могут расходиться больше, чем длится
+# аренда. replicate_commands разрешает запись после TIME в Redis старше 5.0
+_REDIS_NOW = """
+redis.replicate_commands()
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+"""
+# Выдача задач одним скриптом, чтобы два воркера не получили одну задачу
+_REDIS_LEASE = _REDIS_NOW + """
+local expires = now + tonumber(ARGV[2])
+local max_attempts = tonumber(ARGV[3])
+-- Токен истёкшей аренды сбрасывается сразу: опоздавший воркер не должен подтвердить
+-- задачу, которая уже вернулась в очередь ожидающих
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('HDEL', KEYS[5], id)
+    redis.call('ZADD', KEYS[1], now, id)
+end
+local leased = {}
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, tonumber(ARGV[1]))) do
+    redis.call('ZREM', KEYS[1], id)
+    local attempts = tonumber(redis.call('HGET', KEYS[4], id) or '0')
+    if attempts >= max_attempts then
+        redis.call('HDEL', KEYS[5], id)
+        redis.call('HSET', KEYS[6], id, ARGV[5])
+    else
+        attempts = redis.call('HINCRBY', KEYS[4], id, 1)
+        local token = ARGV[4] .. ':' .. id
+        redis.call('HSET', KEYS[5], id, token)
+        redis.call('ZADD', KEYS[2], expires, id)
+        table.insert(leased, {id, redis.call('HGET', KEYS[3], id), attempts, token})
+    end
+end
+return leased
+"""
+# Завершение аренды: ARGV[3] — куда перенести задачу (done, dead или ready);
+# для ready ARGV[4] — пауза в секундах до повторной выдачи
+_REDIS_FINISH = _REDIS_NOW + """
+if redis.call('HGET', KEYS[3], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if ARGV[3] == 'ready' then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[4]), ARGV[1])
+else
+    redis.call('HSET', KEYS[4], ARGV[1], ARGV[4])
+end
+return 1
+"""
+# Постановка товаров: ARGV[1] — "1", если завершённые и мёртвые задачи ставятся заново
+_REDIS_PUT = """
+local added = 0
+for i = 2, #ARGV, 2 do
+    local id = ARGV[i]
+    if redis.call('HSETNX', KEYS[1], id, ARGV[i + 1]) == 1 then
+        redis.call('ZADD', KEYS[2], 0, id)
+        added = added + 1
+    elseif ARGV[1] == '1' and not redis.call('ZSCORE', KEYS[2], id)
+            and not redis.call('ZSCORE', KEYS[3], id) then
+        redis.call('HSET', KEYS[1], id, ARGV[i + 1])
+        redis.call('HDEL', KEYS[4], id)
+        redis.call('HDEL', KEYS[5], id)
+        redis.call('HDEL', KEYS[6], id)
+        redis.call('ZADD', KEYS[2], 0, id)
+        added = added + 1
+    end
+end
+return added
+"""
+
+
+class RedisWorkQueue(WorkQueue):
+    """Очередь в Redis для нескольких машин: redis://host:6379/0.
+
+    Для каждого запроса хранятся хэши ссылок, попыток, токенов аренды, готовых
+    строк и мёртвых задач, а также отсортированные множества ожидающих задач
+    (по времени доступности) и арендованных (по времени истечения аренды).
+    """
+
+    def __init__(self, url: str, max_attempts: int = 3, prefix: str = "ozon"):
+        super().__init__(max_attempts)
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("Для очереди redis:// установите пакет redis") from e
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._lease = self.client.register_script(_REDIS_LEASE)
+        self._finish = self.client.register_script(_REDIS_FINISH)
+        self._put = self.client.register_script(_REDIS_PUT)
+        logger.info(f"Подключена очередь задач {urlsplit(url).hostname}")
+
+    def _keys(self, query: str) -> dict[str, str]:
+        base = f"{self.prefix}:{query}"
+        return {
+            name: f"{base}:{name}"
+            for name in ("ready", "leased", "urls", "attempts", "tokens", "dead", "done")
+        }
+
+    def put(self, query: str, products: dict[str, str], reset: bool = False) -> int:
+        keys = self._keys(query)
+        self.client.sadd(f"{self.prefix}:queries", query)
+        items = list(products.items())
+        added = 0
+        for start in range(0, len(items), 1000):
+            args = ["1" if reset else "0"]
+            args += [value for item in items[start:start + 1000] for value in item]
+            added += self._put(
+                keys=[keys[name] for name in ("urls", "ready", "leased", "attempts", "done", "dead")],
+                args=args,
+            )
+        return added
+
+    def lease(
+        self, query: str, worker: str, limit: int = 1, visibility: float = 300.0
+    ) -> list[Lease]:
+        keys = self._keys(query)
+        leased = self._lease(
+            keys=[keys[name] for name in ("ready", "leased", "urls", "attempts", "tokens", "dead")],
+            args=[limit, visibility, self.max_attempts, f"{worker}:{uuid.uuid4().hex}", LEASE_EXPIRED],
+        )
+        return [
+            Lease(query, product_id, url, int(attempts), token)
+            for product_id, url, attempts, token in leased
+        ]
+
+    def _finish_lease(self, lease: Lease, target: str, value) -> bool:
+        keys = self._keys(lease.query)
+        destination = keys["done"] if target == DONE else keys["dead"]
+        return bool(
+            self._finish(
+                keys=[keys["ready"], keys["leased"], keys["tokens"], destination],
+                args=[lease.product_id, lease.token, target, value],
+            )
+        )
+
+    def ack(self, lease: Lease, row: dict) -> bool:
+        return self._finish_lease(lease, DONE, json.dumps(row, ensure_ascii=False, default=str))
+
+    def nack(self, lease: Lease, error: str, retryable: bool = True, delay: float = 0.0) -> bool:
+        if self._dead(lease, retryable):
+            return self._finish_lease(lease, DEAD, error)
+        self._finish_lease(lease, "ready", delay)
+        return False
+
+    def counts(self, query: str) -> dict[str, int]:
+        keys = self._keys(query)
+        pipe = self.client.pipeline()
+        pipe.zcard(keys["ready"])
+        pipe.zcard(keys["leased"])
+        pipe.hlen(keys["done"])
+        pipe.hlen(keys["dead"])
+        counts = dict(zip((PENDING, LEASED, DONE, DEAD), pipe.execute()))
+        return {state: count for state, count in counts.items() if count}
+
+    def rows(self, query: Optional[str] = None) -> Iterator[dict]:
+        queries = [query] if query is not None else sorted(self.client.smembers(f"{self.prefix}:queries"))
+        for current in queries:
+            for _, row in self.client.hscan_iter(self._keys(current)["done"]):
+                yield json.loads(row)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+# Схема адреса очереди → фабрика; новые сетевые бэкенды добавляются через register_backend
+QUEUE_BACKENDS: dict[str, Callable[[str, int], WorkQueue]] = {
+    "memory": lambda url, max_attempts: MemoryWorkQueue(max_attempts),
+    "sqlite": lambda url, max_attempts: SQLiteWorkQueue(
+        urlsplit(url).path[1:] or "work_queue.sqlite", max_attempts
+    ),
+    "redis": lambda url, max_attempts: RedisWorkQueue(url, max_attempts),
+    "rediss": lambda url, max_attempts: RedisWorkQueue(url, max_attempts),
+}
+
+
+def register_backend(scheme: str, factory: Callable[[str, int], WorkQueue]) -> None:
+    QUEUE_BACKENDS[scheme] = factory
+
+
+def open_work_queue(url: str, max_attempts: int = 3) -> WorkQueue:
+    """Открывает очередь по адресу: sqlite:///work_queue.sqlite, redis://host:6379/0, memory://.
+
+    Адрес без схемы считается путём к файлу SQLite; абсолютный путь — sqlite:////path.
+    """
+    scheme = urlsplit(url).scheme if "://" in url else "sqlite"
+    if "://" not in url:
+        url = f"sqlite:///{url}"
+    if scheme not in QUEUE_BACKENDS:
+        raise ValueError(f"Неизвестная схема очереди задач: {scheme}")
+    return QUEUE_BACKENDS[scheme](url, max_attempts)